@@ -1,54 +1,88 @@
 import os
-import logging
 import pymysql
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix
+from uploads import UploadRequest
+from jobs import job_queue
+from pubsub import pubsub
+import connection_pool
+import instrumentation
+import logs
+import replicas
 # Use PyMySQL as the MySQL connector for SQLAlchemy
 # Only if the DATABASE_URL is MySQL
 if os.environ.get('DATABASE_URL', '').startswith('mysql'):
     pymysql.install_as_MySQLdb()
-    
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-# Initialize Flask application
-app = Flask(__name__)
-
-# Load configuration
-app.config.from_object('config.Config')
 
 # Initialize Flask extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': replicas.RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+login_manager.login_message_category = 'info'
 
-# Configure applications
-app.secret_key = os.environ.get("SESSION_SECRET", "your-secret-key")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Initialize database
-db.init_app(app)
-migrate.init_app(app, db)
+def create_app(config='config.Config'):
+    """Create and configure a Flask application.
 
-# Initialize login manager
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message_category = 'info'
+    Nothing here talks to the database, so workers and CLI commands start
+    without a connection. Create the schema with `flask db upgrade`; for a
+    throwaway database `flask create-db` builds it from the models in one
+    step and stamps it, so later migrations still apply on top.
+    """
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+
+    # Load configuration
+    app.config.from_object(config)
+
+    # Log through a background thread, with request IDs
+    logs.init_app(app)
+
+    # Configure applications
+    app.secret_key = os.environ.get("SESSION_SECRET", "your-secret-key")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Time requests before any other hook runs
+    instrumentation.init_app(app)
+
+    # Initialize database
+    connection_pool.init_app(app)
+    replicas.init_app(app)
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    # Initialize background jobs and live notifications
+    job_queue.init_app(app)
+    pubsub.init_app(app)
+
+    # Initialize login manager
+    login_manager.init_app(app)
+
+    # Models, views and commands are imported here rather than at module
+    # level so that importing db does not pull in the whole application
+    import models  # noqa: F401
+    import user_cache  # noqa: F401
+    from routes import bp
+    app.register_blueprint(bp)
+
+    # Cache rendered document cards
+    import fragments
+    fragments.init_app(app)
 
-# Import models
-from models import User, Document, Notification, Collaboration
+    # Template helpers for avatar thumbnails and document previews
+    import derivatives
+    derivatives.init_app(app)
 
-# Create tables if they don't exist
-with app.app_context():
-    db.create_all()
+    # Unread notification counter for the sidebar badge
+    import notifications
+    notifications.init_app(app)
 
-# Import routes
-from routes import *
+    # Register CLI commands
+    import commands
+    commands.init_app(app)
 
-# User loader for Flask-Login
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+    return app
@@ -0,0 +1,448 @@
+"""Benchmark every route against a seeded database.
+
+Seeds an empty database with users, documents, collaborations and
+notifications, then requests each route through the Flask test client
+and reports latency percentiles, sequential throughput and SQL queries
+per request as JSON, so runs on two commits can be diffed or compared.
+
+    python benchmark_routes.py --requests 200 --output before.json
+    python benchmark_routes.py --requests 200 --baseline before.json
+
+The database defaults to a throwaway SQLite file; --database takes any
+SQLAlchemy URL, which must point at an empty database. Background jobs
+are discarded by default so only the request itself is measured.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PASSWORD = 'benchmark'
+INTERNAL_TOKEN = 'benchmark'
+
+# The user every logged-in scenario runs as, the most active one
+MEMBER_ID = 1
+
+
+class DiscardBackend:
+    """A job queue backend that drops every job, so requests are measured alone."""
+
+    def __init__(self, app, job_queue):
+        pass
+
+    def enqueue(self, name, kwargs):
+        pass
+
+
+def build_app(database_url, folder, jobs):
+    """Create the app against database_url, with uploads kept under folder."""
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    from config import Config
+
+    config = type('BenchmarkConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'WTF_CSRF_ENABLED': False,
+        'JOB_QUEUE_BACKEND': 'benchmark_routes.DiscardBackend' if jobs == 'discard' else 'inline',
+        'INTERNAL_API_TOKEN': INTERNAL_TOKEN,
+        'LOG_LEVEL': 'WARNING',
+        'UPLOAD_FOLDER': os.path.join(folder, 'uploads'),
+        'DOCUMENT_FOLDER': os.path.join(folder, 'uploads', 'documents'),
+        'THUMBNAIL_FOLDER': os.path.join(folder, 'uploads', 'thumbnails'),
+        'PREVIEW_FOLDER': os.path.join(folder, 'uploads', 'previews')
+    })
+    app = create_app(config)
+    os.makedirs(app.config['DOCUMENT_FOLDER'], exist_ok=True)
+    return app
+
+
+def seed(app, users, documents, collaborations, notifications, seed_value):
+    """Fill an empty database with synthetic data and build the derived tables."""
+    from app import db
+    from listings import rebuild_listings
+    from models import User
+    from notifications import reconcile_unread_counts
+    from search import reindex_documents
+    from synthetic import generate_data
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            sys.exit('The benchmark database must be empty.')
+
+        generate_data(users, documents, collaborations, notifications, password=PASSWORD, seed=seed_value)
+        reindex_documents()
+        rebuild_listings()
+        reconcile_unread_counts()
+
+
+class Context:
+    """Clients and helpers shared by the scenarios."""
+
+    def __init__(self, app, users, rng):
+        import synthetic
+        from app import db
+        from models import Collaboration, Document
+
+        self.app = app
+        self.users = users
+        self.rng = rng
+        self.email = synthetic.email
+        self.words = synthetic.WORDS
+        self.colleges = synthetic.COLLEGES
+
+        self.guest = app.test_client()
+        self.member = self.login(app.test_client())
+
+        with app.app_context():
+            self.owned = [document_id for (document_id,) in db.session.query(Document.id).filter_by(user_id=MEMBER_ID)]
+            self.shared = [document_id for (document_id,) in db.session.query(Collaboration.document_id).filter_by(user_id=MEMBER_ID)]
+        if not self.owned:
+            sys.exit('The benchmark user owns no documents; seed more documents or fewer users.')
+        self.viewable = self.shared or self.owned
+
+    def login(self, client, user_id=MEMBER_ID):
+        response = client.post('/login', data={'email': self.email(user_id), 'password': PASSWORD})
+        if response.status_code != 302:
+            sys.exit(f'Could not log in as user{user_id}.')
+        return client
+
+    def pick(self, ids, i):
+        return ids[i % len(ids)]
+
+    def other_user(self, i):
+        """A user other than the member, cycling through all of them."""
+        return i % (self.users - 1) + 2
+
+    def insert(self, model, **values):
+        """Insert a row outside the timed request and return its id."""
+        from sqlalchemy import insert
+
+        from app import db
+
+        with self.app.app_context():
+            result = db.session.execute(insert(model).values(**values))
+            db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def new_document(self):
+        from models import Document
+
+        now = datetime.utcnow()
+        return self.insert(
+            Document, title='Benchmark scratch', file_path='scratch.pdf', file_type='pdf',
+            file_size=1024, is_public=False, uploaded_at=now, last_modified=now, user_id=MEMBER_ID
+        )
+
+    def new_notification(self):
+        from sqlalchemy import update
+
+        from app import db
+        from models import Notification, User
+
+        notification_id = self.insert(
+            Notification, user_id=MEMBER_ID, content='Benchmark notification', is_read=False,
+            created_at=datetime.utcnow()
+        )
+        with self.app.app_context():
+            db.session.execute(update(User).where(User.id == MEMBER_ID).values(
+                unread_notifications=User.unread_notifications + 1
+            ))
+            db.session.commit()
+        return notification_id
+
+    def document_file(self, document_id):
+        """Make sure a document has a file on disk to download."""
+        from app import db
+        from models import Document
+
+        with self.app.app_context():
+            file_path = db.session.get(Document, document_id).file_path
+        path = os.path.join(self.app.config['DOCUMENT_FOLDER'], file_path)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(os.urandom(256 * 1024))
+
+
+def _scratch_collaboration(ctx, i):
+    from models import Collaboration
+
+    document_id = ctx.new_document()
+    user_id = ctx.other_user(i)
+    ctx.insert(Collaboration, document_id=document_id, user_id=user_id, permission='view')
+    return f'/document/{document_id}/remove-collaborator/{user_id}'
+
+
+def _fresh_login(ctx, i):
+    return ctx.login(ctx.app.test_client(), ctx.other_user(i))
+
+
+def _upload(ctx, i):
+    return {
+        'title': f'Benchmark upload {i}',
+        'description': 'Uploaded by the route benchmark',
+        'document': (io.BytesIO(os.urandom(64 * 1024)), f'upload-{i}.pdf')
+    }
+
+
+def _mark_all_path(ctx, i):
+    ctx.new_notification()
+    return '/notifications/mark-all-read'
+
+
+def _download_path(ctx, i):
+    document_id = ctx.pick(ctx.owned, i)
+    ctx.document_file(document_id)
+    return f'/document/{document_id}/download'
+
+
+# (name, endpoint, method, client, path, request options); client is
+# 'guest', 'member' or a function making one, path and options may be
+# functions of (ctx, i) that prepare the request outside the timing
+SCENARIOS = [
+    ('index', 'main.index', 'GET', 'guest', '/', {}),
+    ('role_selection', 'main.role_selection', 'GET', 'guest', '/role-selection', {}),
+    ('role_selection_submit', 'main.role_selection', 'POST', 'guest', '/role-selection', {'data': {'role': 'student'}}),
+    ('register', 'main.register', 'GET', 'guest', '/register/student', {}),
+    ('register_submit', 'main.register', 'POST', 'guest', '/register/student', lambda ctx, i: {'data': {
+        'username': f'new{i}x{ctx.rng.randrange(10 ** 6)}'[:20],
+        'email': f'new{i}.{ctx.rng.randrange(10 ** 9)}@example.com',
+        'password': PASSWORD,
+        'confirm_password': PASSWORD
+    }}),
+    ('login', 'main.login', 'GET', 'guest', '/login', {}),
+    ('login_submit', 'main.login', 'POST', lambda ctx, i: ctx.app.test_client(), '/login', lambda ctx, i: {'data': {
+        'email': ctx.email(ctx.other_user(i)),
+        'password': PASSWORD
+    }}),
+    ('logout', 'main.logout', 'GET', _fresh_login, '/logout', {}),
+    ('dashboard', 'main.dashboard', 'GET', 'member', '/dashboard', {}),
+    ('profile', 'main.profile', 'GET', 'member', '/profile', {}),
+    ('profile_submit', 'main.profile', 'POST', 'member', '/profile', lambda ctx, i: {'data': {
+        'username': f'user{MEMBER_ID}',
+        'email': ctx.email(MEMBER_ID),
+        'college': 'MIT',
+        'field': 'Computer Science'
+    }}),
+    ('upload_document', 'main.upload_document', 'GET', 'member', '/upload-document', {}),
+    ('upload_document_submit', 'main.upload_document', 'POST', 'member', '/upload-document', lambda ctx, i: {
+        'data': _upload(ctx, i),
+        'content_type': 'multipart/form-data'
+    }),
+    ('search', 'main.search', 'GET', 'member', lambda ctx, i: f'/search?q={ctx.pick(ctx.words, i)}', {}),
+    ('discover', 'main.discover', 'GET', 'member', '/discover', {}),
+    ('discover_filtered', 'main.discover', 'GET', 'member', lambda ctx, i: f'/discover?college={ctx.pick(ctx.colleges, i)}', {}),
+    ('discover_page', 'main.discover_page', 'GET', 'member', '/discover/page', {}),
+    ('view_document', 'main.view_document', 'GET', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}', {}),
+    ('view_shared_document', 'main.view_document', 'GET', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.viewable, i)}', {}),
+    ('document_extraction', 'main.document_extraction', 'GET', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/extraction', {}),
+    ('edit_document', 'main.edit_document', 'GET', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/edit', {}),
+    ('edit_document_submit', 'main.edit_document', 'POST', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/edit', lambda ctx, i: {'data': {
+        'title': f'Edited {i}',
+        'description': ' '.join(ctx.rng.choices(ctx.words, k=20))
+    }}),
+    ('download_document', 'main.download_document', 'GET', 'member', _download_path, {}),
+    ('delete_document', 'main.delete_document', 'POST', 'member', lambda ctx, i: f'/document/{ctx.new_document()}/delete', {}),
+    ('collaborate', 'main.collaborate', 'GET', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/collaborate', {}),
+    ('collaborate_submit', 'main.collaborate', 'POST', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/collaborate', lambda ctx, i: {'data': {
+        'collaborator_email': ctx.email(ctx.other_user(i)),
+        'permission': 'view'
+    }}),
+    ('bulk_collaborate', 'main.bulk_collaborate', 'POST', 'member', lambda ctx, i: f'/document/{ctx.pick(ctx.owned, i)}/collaborate/bulk', lambda ctx, i: {'json': {
+        'emails': [ctx.email(ctx.other_user(i + n)) for n in range(20)],
+        'permission': 'view'
+    }}),
+    ('remove_collaborator', 'main.remove_collaborator', 'POST', 'member', _scratch_collaboration, {}),
+    ('notifications', 'main.notifications', 'GET', 'member', '/notifications', {}),
+    ('notifications_page', 'main.notifications_page', 'GET', 'member', '/notifications/page?status=read', {}),
+    ('notification_stream', 'main.notification_stream', 'GET', 'member', '/notifications/stream', {'buffered': False}),
+    ('mark_notification_read', 'main.mark_notification_read', 'POST', 'member', lambda ctx, i: f'/notification/{ctx.new_notification()}/mark-read', {}),
+    ('mark_all_notifications_read', 'main.mark_all_notifications_read', 'POST', 'member', _mark_all_path, {}),
+    ('pool_metrics', 'main.pool_metrics', 'GET', 'guest', '/internal/pool', {'headers': {'Authorization': f'Bearer {INTERNAL_TOKEN}'}}),
+    ('prometheus_metrics', 'main.prometheus_metrics', 'GET', 'guest', '/internal/metrics', {'headers': {'Authorization': f'Bearer {INTERNAL_TOKEN}'}})
+]
+
+
+def _resolve(value, ctx, i):
+    return value(ctx, i) if callable(value) else value
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(ctx, scenario, requests, warmup, query_counter):
+    """Time one scenario and summarize its latencies and query counts."""
+    name, endpoint, method, client, path, options = scenario
+    latencies = []
+    queries = []
+    statuses = {}
+
+    for i in range(warmup + requests):
+        # Everything the request needs is prepared before the clock starts
+        request_client = ctx.guest if client == 'guest' else ctx.member if client == 'member' else client(ctx, i)
+        request_path = _resolve(path, ctx, i)
+        request_options = dict(_resolve(options, ctx, i))
+        stream = request_options.get('buffered') is False
+
+        query_counter['count'] = 0
+        start = time.perf_counter()
+        response = request_client.open(request_path, method=method, **request_options)
+        if stream:
+            # A stream never ends on its own; time its first event
+            next(iter(response.response))
+        else:
+            response.get_data()
+        elapsed = time.perf_counter() - start
+        response.close()
+
+        if i >= warmup:
+            latencies.append(elapsed)
+            queries.append(query_counter['count'])
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    latencies.sort()
+    total = sum(latencies)
+    return name, {
+        'endpoint': endpoint,
+        'method': method,
+        'requests': requests,
+        'statuses': statuses,
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+        'throughput_rps': round(requests / total, 1) if total else None,
+        'latency_ms': {
+            'mean': round(total / requests * 1000, 3),
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3)
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / requests, 2),
+            'max': max(queries)
+        }
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline):
+    """A readable summary on stderr, with changes against the baseline if given."""
+    header = f'{"route":<30}{"rps":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}{"errors":>8}'
+    if baseline:
+        header += f'{"p50 change":>12}{"queries change":>16}'
+    print(header, file=sys.stderr)
+
+    for name, result in results['routes'].items():
+        latency = result['latency_ms']
+        line = (
+            f'{name:<30}{result["throughput_rps"] or 0:>9.1f}{latency["p50"]:>10.2f}{latency["p95"]:>10.2f}'
+            f'{latency["p99"]:>10.2f}{result["queries_per_request"]["mean"]:>9.1f}{result["errors"]:>8}'
+        )
+        previous = baseline.get('routes', {}).get(name) if baseline else None
+        if previous:
+            change = (latency['p50'] - previous['latency_ms']['p50']) / previous['latency_ms']['p50'] * 100 if previous['latency_ms']['p50'] else 0
+            queries = result['queries_per_request']['mean'] - previous['queries_per_request']['mean']
+            line += f'{change:>+11.1f}%{queries:>+16.1f}'
+        print(line, file=sys.stderr)
+
+    if results['unbenchmarked']:
+        print(f'Routes without a scenario: {", ".join(results["unbenchmarked"])}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='SQLAlchemy URL of an empty database. [default: a temporary SQLite file]')
+    parser.add_argument('--users', type=int, default=200, help='Users to seed.')
+    parser.add_argument('--documents', type=int, default=2000, help='Documents to seed.')
+    parser.add_argument('--collaborations', type=int, default=5000, help='Collaborations to seed.')
+    parser.add_argument('--notifications', type=int, default=20000, help='Notifications to seed.')
+    parser.add_argument('--requests', type=int, default=100, help='Timed requests per route.')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route before timing.')
+    parser.add_argument('--routes', help='Comma-separated scenario names to run. [default: all]')
+    parser.add_argument('--jobs', choices=('discard', 'inline'), default='discard', help='Drop background jobs, or run them inside the request.')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed, so runs on different commits see the same data.')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout.')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against.')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='benchmark-')
+    database_url = args.database or f'sqlite:///{os.path.join(folder, "benchmark.db")}'
+    rng = random.Random(args.seed)
+
+    app = build_app(database_url, folder, args.jobs)
+    seed(app, args.users, args.documents, args.collaborations, args.notifications, args.seed)
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from flask import has_request_context
+
+    # Only statements run by the request count, not the scenario setup
+    query_counter = {'count': 0}
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            query_counter['count'] += 1
+
+    ctx = Context(app, args.users, rng)
+    selected = set(args.routes.split(',')) if args.routes else None
+    scenarios = [scenario for scenario in SCENARIOS if selected is None or scenario[0] in selected]
+
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+    results = {
+        'meta': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'jobs': args.jobs,
+            'seed': args.seed,
+            'counts': {
+                'users': args.users,
+                'documents': args.documents,
+                'collaborations': args.collaborations,
+                'notifications': args.notifications
+            },
+            'requests': args.requests,
+            'warmup': args.warmup
+        },
+        'routes': dict(run_scenario(ctx, scenario, args.requests, args.warmup, query_counter) for scenario in scenarios),
+        'unbenchmarked': sorted(endpoints - {scenario[1] for scenario in SCENARIOS})
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
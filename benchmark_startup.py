@@ -0,0 +1,65 @@
+"""Measure how long a fresh process takes to become ready to serve.
+
+Every run starts a new interpreter, as a gunicorn worker or a CLI command
+would, and times importing the app module, calling create_app() and
+serving a first request that does not touch the database.
+
+    python benchmark_startup.py --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - start,
+}}))
+"""
+
+PHASES = ('import', 'create_app', 'first_request', 'total')
+
+
+def run_once(path):
+    """Time one cold start in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(path=path)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Number of cold starts to time.')
+    parser.add_argument('--path', default='/login', help='Path requested once the app is created.')
+    args = parser.parse_args()
+
+    # Warm the OS file cache so the first run is not an outlier
+    run_once(args.path)
+    samples = [run_once(args.path) for _ in range(args.runs)]
+
+    print(f'{"phase":<14}{"min ms":>10}{"median ms":>12}{"max ms":>10}')
+    for phase in PHASES:
+        timings = [sample[phase] * 1000 for sample in samples]
+        print(f'{phase:<14}{min(timings):>10.1f}{statistics.median(timings):>12.1f}{max(timings):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
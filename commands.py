@@ -0,0 +1,141 @@
+import os
+import time
+
+import click
+from alembic.migration import MigrationContext
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_migrate import stamp
+
+from app import db
+from storage import dedupe_document_folder
+from search import reindex_documents
+from notifications import reconcile_unread_counts, compact_notifications
+from listings import rebuild_listings
+from synthetic import generate_data
+
+
+@click.command('create-db')
+@with_appcontext
+def create_db():
+    """Create the tables from the models and stamp them with the latest revision.
+
+    Meant for local and throwaway databases; the stamp lets `flask db
+    upgrade` apply only migrations written after this. Databases already
+    under migration are left to `flask db upgrade`.
+    """
+    with db.engine.connect() as connection:
+        revision = MigrationContext.configure(connection).get_current_revision()
+    if revision is not None:
+        raise click.UsageError(f'The database is already at revision {revision}, run `flask db upgrade` instead.')
+
+    db.create_all()
+    stamp(revision='head')
+    click.echo('Database tables created.')
+
+
+@click.command('dedupe-documents')
+@click.option('--batch-size', default=500, show_default=True, help='Documents hashed per transaction.')
+@with_appcontext
+def dedupe_documents(batch_size):
+    """Move existing uploads into the content-addressed blob store."""
+    moved, missing, freed = dedupe_document_folder(batch_size)
+    click.echo(f'Moved {moved} documents, freed {freed / (1024 * 1024):.1f} MB.')
+    if missing:
+        click.echo(f'{missing} documents have no file on disk and were left as they are.')
+
+
+@click.command('reindex-search')
+@click.option('--batch-size', default=1000, show_default=True, help='Documents indexed per transaction.')
+@with_appcontext
+def reindex_search(batch_size):
+    """Rebuild the document search index from scratch."""
+    indexed = reindex_documents(batch_size)
+    click.echo(f'Indexed {indexed} documents.')
+
+
+@click.command('rebuild-listings')
+@click.option('--batch-size', default=1000, show_default=True, help='Documents checked per transaction.')
+@with_appcontext
+def rebuild_public_listings(batch_size):
+    """Rebuild the public document listing behind the discover feed."""
+    listed = rebuild_listings(batch_size)
+    click.echo(f'Listed {listed} public documents.')
+
+
+@click.command('reconcile-notifications')
+@click.option('--batch-size', default=1000, show_default=True, help='Users checked per transaction.')
+@with_appcontext
+def reconcile_notifications(batch_size):
+    """Recount unread notifications for users whose counter has drifted."""
+    repaired = reconcile_unread_counts(batch_size)
+    click.echo(f'Repaired {repaired} unread counters.')
+
+
+@click.command('compact-notifications')
+@click.option('--days', default=None, type=int, help='Archive read notifications older than this. [default: NOTIFICATION_RETENTION_DAYS]')
+@click.option('--batch-size', default=1000, show_default=True, help='Notifications changed per transaction.')
+@with_appcontext
+def compact_notifications_command(days, batch_size):
+    """Coalesce repeated notifications and archive old read ones."""
+    coalesced, archived = compact_notifications(days, batch_size)
+    click.echo(f'Coalesced {coalesced} and archived {archived} notifications.')
+
+
+@click.command('generate-data')
+@click.option('--users', default=10000, show_default=True, help='Users to add.')
+@click.option('--documents', default=100000, show_default=True, help='Documents to add.')
+@click.option('--collaborations', default=300000, show_default=True, help='Collaborations to add, approximately.')
+@click.option('--notifications', default=1000000, show_default=True, help='Notifications to add.')
+@click.option('--skew', default=0.8, show_default=True, help='How strongly activity favours the first users; 0 spreads it evenly.')
+@click.option('--days', default=365, show_default=True, help='Days of history to spread timestamps over.')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per INSERT and commit.')
+@click.option('--files/--no-files', default=False, help='Create a sparse file for every document in DOCUMENT_FOLDER.')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@click.option('--seed', default=None, type=int, help='Random seed, for repeatable datasets.')
+@click.option('--skip-derived', is_flag=True, help='Leave the search index, public listing and unread counters to be rebuilt later.')
+@with_appcontext
+def generate_data_command(users, documents, collaborations, notifications, skew, days, batch_size, files, password, seed, skip_derived):
+    """Bulk-insert synthetic users, documents, shares and notifications.
+
+    Meant for local and load-testing databases. Generated users are
+    user<id>@example.com and share one password.
+    """
+    if (documents or notifications) and not users:
+        raise click.UsageError('Documents and notifications need --users to belong to.')
+    if notifications and users < 2:
+        raise click.UsageError('Notifications need at least two --users, a recipient and a sender.')
+    if notifications and not documents:
+        raise click.UsageError('Notifications need --documents to refer to.')
+
+    files_folder = None
+    if files:
+        files_folder = os.path.join(current_app.root_path, current_app.config['DOCUMENT_FOLDER'])
+        os.makedirs(files_folder, exist_ok=True)
+
+    start = time.monotonic()
+    written = generate_data(
+        users, documents, collaborations, notifications,
+        skew=skew, days=days, batch_size=batch_size, files_folder=files_folder,
+        password=password, seed=seed, progress=click.echo
+    )
+    click.echo(
+        f'Added {written["users"]} users, {written["documents"]} documents, {written["collaborations"]} collaborations '
+        f'and {written["notifications"]} notifications in {time.monotonic() - start:.0f}s.'
+    )
+
+    if not skip_derived:
+        click.echo(f'Indexed {reindex_documents(batch_size)} documents.')
+        click.echo(f'Listed {rebuild_listings(batch_size)} public documents.')
+        click.echo(f'Repaired {reconcile_unread_counts(batch_size)} unread counters.')
+
+
+def init_app(app):
+    """Register the application's CLI commands."""
+    app.cli.add_command(create_db)
+    app.cli.add_command(dedupe_documents)
+    app.cli.add_command(reindex_search)
+    app.cli.add_command(rebuild_public_listings)
+    app.cli.add_command(reconcile_notifications)
+    app.cli.add_command(compact_notifications_command)
+    app.cli.add_command(generate_data_command)
@@ -0,0 +1,194 @@
+import os
+import time
+from threading import Lock
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds of the checkout time histogram, in seconds
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.5, 2.5)
+
+PRE_PING_STRATEGIES = ('always', 'idle', 'never')
+
+# Seconds a connection must sit in the pool before the 'idle' strategy pings it
+_ping_idle_after = None
+
+
+class PoolMetrics:
+    """Checkout timings and connection churn for this process's pool.
+
+    Every gunicorn worker has its own pool and its own metrics, so sizing
+    is read per worker: saturation near 1 with a growing wait means the
+    worker needs more connections, a low peak means it has too many.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_seconds = 0.0
+            self.checkout_max_seconds = 0.0
+            self.buckets = [0] * (len(CHECKOUT_BUCKETS) + 1)
+            self.timeouts = 0
+            self.peak_checked_out = 0
+            self.opened = 0
+            self.closed = 0
+            self.invalidated = 0
+            self.pings = 0
+            self.ping_failures = 0
+
+    def record_checkout(self, seconds, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += seconds
+            self.checkout_max_seconds = max(self.checkout_max_seconds, seconds)
+            self.buckets[next(
+                (i for i, bound in enumerate(CHECKOUT_BUCKETS) if seconds <= bound),
+                len(CHECKOUT_BUCKETS)
+            )] += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool):
+        """The metrics and the pool's current state as a JSON-ready dict."""
+        state = {'class': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + pool._max_overflow
+            state.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                saturation=round(pool.checkedout() / capacity, 3) if capacity > 0 else None
+            )
+
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(CHECKOUT_BUCKETS + ('+Inf',), self.buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+
+            state['peak_checked_out'] = self.peak_checked_out
+            return {
+                'pid': os.getpid(),
+                'pool': state,
+                'checkouts': {
+                    'count': self.checkouts,
+                    'wait_seconds_total': round(self.checkout_seconds, 6),
+                    'wait_seconds_max': round(self.checkout_max_seconds, 6),
+                    'wait_seconds_buckets': buckets,
+                    'timeouts': self.timeouts
+                },
+                'connections': {
+                    'opened': self.opened,
+                    'closed': self.closed,
+                    'invalidated': self.invalidated,
+                    'pings': self.pings,
+                    'ping_failures': self.ping_failures
+                }
+            }
+
+
+metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool that times every checkout, including waits for a free slot."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            metrics.increment('timeouts')
+            raise
+        metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+
+@event.listens_for(QueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    metrics.increment('opened')
+
+
+@event.listens_for(QueuePool, 'close')
+def _on_close(dbapi_connection, connection_record):
+    metrics.increment('closed')
+
+
+@event.listens_for(QueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    metrics.increment('invalidated')
+
+
+@event.listens_for(QueuePool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    connection_record.info['checked_in_at'] = time.monotonic()
+
+
+@event.listens_for(QueuePool, 'checkout')
+def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+    """Ping connections that sat idle long enough for the server to drop them.
+
+    Raising DisconnectionError makes the pool discard the connection and
+    retry the checkout with a new one.
+    """
+    if _ping_idle_after is None:
+        return
+    checked_in_at = connection_record.info.get('checked_in_at')
+    if checked_in_at is None or time.monotonic() - checked_in_at < _ping_idle_after:
+        return
+
+    metrics.increment('pings')
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception as e:
+        metrics.increment('ping_failures')
+        raise exc.DisconnectionError() from e
+
+
+def uses_queue_pool(database_uri):
+    """Whether SQLAlchemy gives this database a QueuePool.
+
+    In-memory SQLite gets a SingletonThreadPool instead, which rejects the
+    pool sizing arguments.
+    """
+    url = make_url(database_uri)
+    return issubclass(url.get_dialect().get_pool_class(url), QueuePool)
+
+
+def init_app(app):
+    """Apply DB_POOL_PRE_PING, DB_POOL_OPTIONS and the instrumented pool to the engine options.
+
+    Must run before db.init_app(), which creates the engine. 'always' is
+    SQLAlchemy's pool_pre_ping, a round trip on every checkout; 'idle' only
+    pings connections unused for DB_POOL_PING_IDLE_AFTER seconds; 'never'
+    relies on pool_recycle alone. The pool sizing and the instrumented pool
+    are only used when the database gets a QueuePool.
+    """
+    global _ping_idle_after
+
+    strategy = app.config['DB_POOL_PRE_PING']
+    if strategy not in PRE_PING_STRATEGIES:
+        raise ValueError(f'DB_POOL_PRE_PING must be one of {", ".join(PRE_PING_STRATEGIES)}, not {strategy!r}')
+    _ping_idle_after = app.config['DB_POOL_PING_IDLE_AFTER'] if strategy == 'idle' else None
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options['pool_pre_ping'] = strategy == 'always'
+    if 'poolclass' not in options and uses_queue_pool(app.config['SQLALCHEMY_DATABASE_URI']):
+        for name, value in app.config['DB_POOL_OPTIONS'].items():
+            options.setdefault(name, value)
+        options['poolclass'] = InstrumentedQueuePool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
@@ -139,6 +139,129 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Load further pages of notifications
+    const loadMoreButtons = document.querySelectorAll('.load-more-notifications');
+    
+    if (loadMoreButtons.length > 0) {
+        loadMoreButtons.forEach(button => {
+            button.addEventListener('click', function() {
+                const list = document.querySelector(this.getAttribute('data-target'));
+                
+                this.disabled = true;
+                
+                fetch(this.getAttribute('data-next-url'), { headers: { 'Accept': 'application/json' } })
+                    .then(response => response.json())
+                    .then(data => {
+                        data.notifications.forEach(notification => {
+                            list.appendChild(renderNotification(notification));
+                        });
+                        
+                        if (data.next_url) {
+                            this.setAttribute('data-next-url', data.next_url);
+                            this.disabled = false;
+                        } else {
+                            this.parentElement.remove();
+                        }
+                    })
+                    .catch(() => {
+                        this.disabled = false;
+                    });
+            });
+        });
+    }
+    
+    // Live notifications over Server-Sent Events
+    const notificationsLink = document.querySelector('[data-notification-stream]');
+    
+    if (notificationsLink && window.EventSource) {
+        const stream = new EventSource(notificationsLink.getAttribute('data-notification-stream'));
+        
+        stream.addEventListener('notification', function(e) {
+            const notification = JSON.parse(e.data);
+            updateNotificationBadge(notification.unread_count);
+            
+            const list = document.querySelector('#recent-notifications, #unread-list');
+            if (list) {
+                notification.is_read = false;
+                list.prepend(renderNotification(notification));
+                
+                // The dashboard only shows the latest few
+                const limit = parseInt(list.getAttribute('data-limit'), 10);
+                while (limit && list.children.length > limit) {
+                    list.lastElementChild.remove();
+                }
+                
+                const empty = list.parentElement.querySelector('.notifications-empty');
+                if (empty) {
+                    empty.remove();
+                }
+            }
+        });
+        
+        stream.addEventListener('unread', function(e) {
+            updateNotificationBadge(JSON.parse(e.data).unread_count);
+        });
+    }
+    
+    function updateNotificationBadge(count) {
+        let badge = notificationsLink.querySelector('.notification-badge');
+        
+        if (count <= 0) {
+            if (badge) {
+                badge.remove();
+            }
+            return;
+        }
+        
+        if (!badge) {
+            badge = document.createElement('span');
+            badge.className = 'notification-badge';
+            notificationsLink.appendChild(badge);
+        }
+        badge.textContent = count < 10 ? count : '9+';
+    }
+    
+    // Build a notification list item matching the server-rendered markup
+    function renderNotification(notification) {
+        const item = document.createElement('div');
+        item.className = 'list-group-item list-group-item-action notification-item' + (notification.is_read ? '' : ' unread');
+        
+        const row = document.createElement('div');
+        row.className = 'd-flex justify-content-between align-items-center';
+        
+        const body = document.createElement('div');
+        const content = document.createElement('p');
+        content.className = 'mb-1';
+        content.textContent = notification.content;
+        
+        if (notification.is_read) {
+            body.appendChild(content);
+        } else {
+            const heading = document.createElement('div');
+            heading.className = 'd-flex align-items-center';
+            heading.innerHTML = '<i class="fas fa-circle text-primary me-2 small"></i>';
+            heading.appendChild(content);
+            body.appendChild(heading);
+        }
+        
+        const time = document.createElement('p');
+        time.className = 'notification-time mb-0';
+        time.textContent = notification.created_at;
+        body.appendChild(time);
+        row.appendChild(body);
+        
+        if (!notification.is_read) {
+            const form = document.createElement('form');
+            form.action = notification.mark_read_url;
+            form.method = 'POST';
+            form.innerHTML = '<button type="submit" class="btn btn-sm btn-outline-secondary"><i class="fas fa-check"></i></button>';
+            row.appendChild(form);
+        }
+        
+        item.appendChild(row);
+        return item;
+    }
+
     // Toggle sections in dashboard
     const sectionTogglers = document.querySelectorAll('.section-toggler');
     
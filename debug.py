@@ -11,12 +11,12 @@ try:
     print("Templates folder exists:", os.path.exists('templates'))
 
     # Import the app
-    from app import app
+    from app import create_app, db
+    app = create_app()
     print("App imported successfully")
     print("Database URI:", app.config['SQLALCHEMY_DATABASE_URI'])
     
     # Test database connection
-    from app import db
     with app.app_context():
         try:
             db.engine.connect()
@@ -0,0 +1,131 @@
+import os
+from urllib.parse import quote
+
+from flask import current_app, url_for
+
+from app import db
+from imaging import make_thumbnails, render_text_preview
+from jobs import job_queue, process_pool
+from models import User, Document, TextChunk
+from storage import hash_file
+from user_cache import invalidate_user
+
+# Avatar thumbnail sizes in pixels, about twice the largest size each is shown at
+AVATAR_SIZES = {'sm': 64, 'lg': 200}
+
+# First-page document previews, in pixels
+PREVIEW_SIZE = (240, 310)
+
+
+def _folder(name):
+    """Absolute path of a folder from config, relative to the app root."""
+    return os.path.join(current_app.root_path, current_app.config[name])
+
+
+def _static_url(name, relative_path):
+    """URL of a file in a folder from config that lies under static/."""
+    folder = os.path.relpath(_folder(name), current_app.static_folder)
+    return url_for('static', filename=f'{folder}/{relative_path}'.replace(os.sep, '/'))
+
+
+def thumbnail_path(content_hash, size):
+    """Location of an avatar thumbnail relative to THUMBNAIL_FOLDER."""
+    return f'{content_hash[:2]}/{content_hash}-{size}.webp'
+
+
+def preview_path(content_hash):
+    """Location of a document preview relative to PREVIEW_FOLDER."""
+    return f'{content_hash[:2]}/{content_hash}.webp'
+
+
+def avatar_url(user, size='sm'):
+    """URL of a user's avatar, using the thumbnail once it has been made."""
+    pixels = AVATAR_SIZES[size]
+    if user.avatar_hash:
+        return _static_url('THUMBNAIL_FOLDER', thumbnail_path(user.avatar_hash, pixels))
+    if user.profile_image != 'default.jpg':
+        return url_for('static', filename='uploads/' + user.profile_image)
+    return f'https://ui-avatars.com/api/?name={quote(user.username)}&background=3FA796&color=fff&size={pixels}'
+
+
+def preview_url(document):
+    """URL of a document's first-page preview, or None if there is none yet."""
+    if not document.preview_path:
+        return None
+    return _static_url('PREVIEW_FOLDER', document.preview_path)
+
+
+def queue_avatar_thumbnails(user_id):
+    """Make thumbnails of a user's newly committed profile image in the background."""
+    job_queue.enqueue('generate_avatar_thumbnails', user_id=user_id)
+
+
+@job_queue.job
+def generate_avatar_thumbnails(user_id):
+    """Make the AVATAR_SIZES thumbnails of a user's profile image.
+
+    Thumbnails are stored by the image's content hash, so an image that
+    was seen before is not resized again.
+    """
+    user = db.session.get(User, user_id)
+    if user is None or user.profile_image == 'default.jpg':
+        return
+
+    profile_image = user.profile_image
+    source = os.path.join(_folder('UPLOAD_FOLDER'), profile_image)
+    content_hash, size = hash_file(source)
+
+    destinations = {
+        pixels: os.path.join(_folder('THUMBNAIL_FOLDER'), thumbnail_path(content_hash, pixels))
+        for pixels in AVATAR_SIZES.values()
+    }
+    missing = {pixels: path for pixels, path in destinations.items() if not os.path.exists(path)}
+    if missing:
+        process_pool().submit(make_thumbnails, source, missing).result(
+            timeout=current_app.config['DERIVATIVE_TIMEOUT']
+        )
+
+    # Skip the update if the user changed their image in the meantime
+    User.query.filter_by(id=user_id, profile_image=profile_image).update({User.avatar_hash: content_hash})
+    db.session.commit()
+    invalidate_user(user_id)
+
+
+@job_queue.job
+def generate_document_preview(document_id):
+    """Draw a preview of a document's first page from its extracted text.
+
+    Previews are stored by content hash and shared by every document with
+    the same file, so a duplicate upload reuses the existing image.
+    """
+    document = db.session.get(Document, document_id)
+    if document is None or not document.content_hash:
+        return
+
+    content_hash = document.content_hash
+    relative_path = preview_path(content_hash)
+    path = os.path.join(_folder('PREVIEW_FOLDER'), relative_path)
+
+    if not os.path.exists(path):
+        text = '\n'.join(content for (content,) in db.session.query(TextChunk.content).filter_by(
+            document_id=document_id,
+            page=0
+        ).order_by(TextChunk.position))
+        if not text.strip():
+            return
+        process_pool().submit(render_text_preview, text, path, PREVIEW_SIZE).result(
+            timeout=current_app.config['DERIVATIVE_TIMEOUT']
+        )
+
+    # A preview is not an edit, so last_modified is left as it is
+    Document.query.filter_by(content_hash=content_hash).update(
+        {Document.preview_path: relative_path, Document.last_modified: Document.last_modified},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+def init_app(app):
+    """Make avatar_url() and preview_url() available in templates."""
+    app.jinja_env.globals['avatar_url'] = avatar_url
+    app.jinja_env.globals['preview_url'] = preview_url
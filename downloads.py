@@ -0,0 +1,61 @@
+import mimetypes
+import os
+import unicodedata
+from urllib.parse import quote
+
+from flask import current_app, request, send_from_directory
+
+
+def content_disposition_filename(download_name):
+    """Filename options for Content-Disposition, as send_file() builds them."""
+    try:
+        download_name.encode('ascii')
+        return {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+
+
+def send_document(document):
+    """Send a document's file as a download.
+
+    Responses carry a strong ETag derived from the stored content hash, so
+    revalidation gets a 304 and resumed downloads get a 206 for the requested
+    byte range. With X_ACCEL_REDIRECT_PREFIX set, the bytes are left to the
+    front proxy and the worker only returns headers; USE_X_SENDFILE does the
+    same for servers that understand X-Sendfile.
+    """
+    folder = os.path.join(current_app.root_path, current_app.config['DOCUMENT_FOLDER'])
+    download_name = f"{document.title}.{document.file_type}"
+
+    # Documents stored before content hashing fall back to Werkzeug's
+    # mtime and size based ETag
+    etag = document.content_hash or True
+
+    accel_prefix = current_app.config['X_ACCEL_REDIRECT_PREFIX']
+    if accel_prefix:
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(document.file_path)
+        response.headers.set('Content-Disposition', 'attachment', **content_disposition_filename(download_name))
+        if document.content_hash:
+            response.set_etag(document.content_hash)
+        # Answer revalidation here, the proxy handles ranges on its own
+        response = response.make_conditional(request)
+    else:
+        response = send_from_directory(
+            folder,
+            document.file_path,
+            as_attachment=True,
+            download_name=download_name,
+            etag=etag,
+            conditional=True
+        )
+        # Werkzeug only sends this on range requests, advertise it up front
+        # so clients know an interrupted download can be resumed
+        response.accept_ranges = 'bytes'
+
+    # Downloads sit behind a login, keep them out of shared caches
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,109 @@
+import logging
+import os
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app import db
+from extractors import SUPPORTED_TYPES, extract_batches
+from jobs import job_queue, process_pool, process_queue
+from models import Document, TextExtraction, TextChunk
+from search import index_document
+from storage import document_folder
+
+logger = logging.getLogger(__name__)
+
+
+def split_chunks(text, size):
+    """Split text into pieces of at most size characters, at whitespace if possible."""
+    text = text.strip()
+    while len(text) > size:
+        cut = max(text.rfind(' ', 0, size), text.rfind('\n', 0, size))
+        if cut <= 0:
+            cut = size
+        yield text[:cut].rstrip()
+        text = text[cut:].lstrip()
+    if text:
+        yield text
+
+
+def queue_text_extraction(document_id):
+    """Extract a committed document's text in the background."""
+    job_queue.enqueue('extract_document_text', document_id=document_id)
+
+
+def text_preview(document_id):
+    """The first stored chunk of a document's text, or None."""
+    chunk = TextChunk.query.filter_by(document_id=document_id, position=0).first()
+    return chunk.content if chunk else None
+
+
+def delete_extracted_text(document_id):
+    """Remove a document's extracted text and progress record."""
+    TextChunk.query.filter_by(document_id=document_id).delete(synchronize_session=False)
+    TextExtraction.query.filter_by(document_id=document_id).delete(synchronize_session=False)
+
+
+@job_queue.job
+def extract_document_text(document_id):
+    """Extract a document's text into chunks, a batch of pages at a time.
+
+    Parsing runs in the shared process pool so large files never hold the
+    job thread or the GIL. One pool worker reads the whole file and hands
+    the pages back a batch at a time; each is committed with the progress record,
+    so TextExtraction.pages_done can be polled while a long document is
+    being read. Once done, the text is added to the search index and a
+    preview of the first page is queued.
+    """
+    document = db.session.get(Document, document_id)
+    if document is None:
+        return
+
+    extraction = document.text_extraction or TextExtraction(document_id=document_id)
+    db.session.add(extraction)
+    TextChunk.query.filter_by(document_id=document_id).delete(synchronize_session=False)
+    extraction.pages_done = 0
+    extraction.pages_total = None
+    extraction.error = None
+    extraction.status = 'running' if document.file_type in SUPPORTED_TYPES else 'unsupported'
+    db.session.commit()
+    if extraction.status == 'unsupported':
+        return
+
+    config = current_app.config
+    path = os.path.join(document_folder(), document.file_path)
+    file_type = document.file_type
+    batch_size = config['EXTRACTION_PAGES_PER_BATCH']
+    max_pages = config['EXTRACTION_MAX_PAGES']
+    timeout = config['EXTRACTION_TIMEOUT']
+    page = position = 0
+
+    try:
+        # One batch at a time is waiting, so the worker never reads far ahead
+        batches = process_queue(1)
+        reading = process_pool().submit(extract_batches, path, file_type, batch_size, max_pages, batches, timeout)
+        for texts, total in iter(lambda: batches.get(timeout=timeout), None):
+            rows = []
+            for text in texts:
+                for content in split_chunks(text, config['EXTRACTION_CHUNK_SIZE']):
+                    rows.append({'document_id': document_id, 'position': position, 'page': page, 'content': content})
+                    position += 1
+                page += 1
+            if rows:
+                db.session.execute(insert(TextChunk), rows)
+
+            extraction.pages_done = page
+            extraction.pages_total = total
+            db.session.commit()
+        reading.result(timeout=timeout)
+
+        extraction.status = 'done'
+        index_document(document)
+        db.session.commit()
+        job_queue.enqueue('generate_document_preview', document_id=document_id)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Text extraction failed for document %s', document_id)
+        extraction.status = 'failed'
+        extraction.error = str(e)[:255] or type(e).__name__
+        db.session.commit()
@@ -0,0 +1,169 @@
+"""Plain-text extraction for uploaded documents.
+
+These functions run in worker processes, so this module only imports the
+standard library and the parsers it needs, never the app.
+"""
+import codecs
+import re
+import zipfile
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+from pypdf import PdfReader
+
+# Plain text and RTF have no pages, so they are read in blocks of this many bytes
+TEXT_PAGE_SIZE = 16 * 1024
+
+# Word documents are split into pages of this many paragraphs
+DOCX_PAGE_PARAGRAPHS = 50
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DRAWING_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+RTF_CONTROL = re.compile(r"\\'[0-9a-fA-F]{2}|\\[a-zA-Z]+-?\d* ?|\\[^a-zA-Z]|[{}]")
+
+
+def _iter_text_blocks(path):
+    """Read a text file in blocks without splitting multi-byte characters."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(TEXT_PAGE_SIZE), b''):
+            yield decoder.decode(block)
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+def iter_txt_pages(path):
+    yield from _iter_text_blocks(path)
+
+
+def iter_rtf_pages(path):
+    # Control words can straddle a block boundary, so blocks end at a newline
+    carry = ''
+    for block in _iter_text_blocks(path):
+        block = carry + block
+        cut = block.rfind('\n') + 1 or len(block)
+        block, carry = block[:cut], block[cut:]
+        yield RTF_CONTROL.sub('', block)
+    if carry:
+        yield RTF_CONTROL.sub('', carry)
+
+
+def _iter_xml_text(archive, member, text_tag, break_tag):
+    """Yield the text of each break_tag element in a zipped XML part, streaming."""
+    parts = []
+    with archive.open(member) as f:
+        for event, element in iterparse(f, events=('end',)):
+            if element.tag == text_tag and element.text:
+                parts.append(element.text)
+            elif element.tag == break_tag:
+                yield ''.join(parts)
+                parts = []
+                element.clear()
+
+
+def iter_docx_pages(path):
+    with zipfile.ZipFile(path) as archive:
+        paragraphs = _iter_xml_text(archive, 'word/document.xml', WORD_NS + 't', WORD_NS + 'p')
+        while True:
+            page = list(islice(paragraphs, DOCX_PAGE_PARAGRAPHS))
+            if not page:
+                break
+            yield '\n'.join(page)
+
+
+def _pptx_slides(archive):
+    slides = [name for name in archive.namelist() if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)]
+    return sorted(slides, key=lambda name: int(re.search(r'\d+', name.rsplit('/', 1)[1]).group()))
+
+
+def iter_pptx_pages(path):
+    with zipfile.ZipFile(path) as archive:
+        for slide in _pptx_slides(archive):
+            yield '\n'.join(_iter_xml_text(archive, slide, DRAWING_NS + 't', DRAWING_NS + 'p'))
+
+
+def _xlsx_sheets(archive):
+    sheets = [name for name in archive.namelist() if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name)]
+    return sorted(sheets, key=lambda name: int(re.search(r'\d+', name.rsplit('/', 1)[1]).group()))
+
+
+def iter_xlsx_pages(path):
+    with zipfile.ZipFile(path) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            shared = list(_iter_xml_text(archive, 'xl/sharedStrings.xml', SHEET_NS + 't', SHEET_NS + 'si'))
+
+        for sheet in _xlsx_sheets(archive):
+            rows = []
+            cells = []
+            with archive.open(sheet) as f:
+                for event, element in iterparse(f, events=('end',)):
+                    if element.tag == SHEET_NS + 'c':
+                        value = element.findtext(SHEET_NS + 'v') or element.findtext(f'{SHEET_NS}is/{SHEET_NS}t')
+                        if value is not None:
+                            cells.append(shared[int(value)] if element.get('t') == 's' else value)
+                        element.clear()
+                    elif element.tag == SHEET_NS + 'row':
+                        rows.append('\t'.join(cells))
+                        cells = []
+                        element.clear()
+            yield '\n'.join(rows)
+
+
+def iter_pdf_pages(path):
+    for page in PdfReader(path).pages:
+        yield page.extract_text() or ''
+
+
+def count_pages(path, file_type):
+    """Total pages for formats that have them, otherwise None."""
+    if file_type == 'pdf':
+        return len(PdfReader(path).pages)
+    if file_type == 'pptx':
+        with zipfile.ZipFile(path) as archive:
+            return len(_pptx_slides(archive))
+    if file_type == 'xlsx':
+        with zipfile.ZipFile(path) as archive:
+            return len(_xlsx_sheets(archive))
+    return None
+
+
+PAGE_READERS = {
+    'pdf': iter_pdf_pages,
+    'txt': iter_txt_pages,
+    'rtf': iter_rtf_pages,
+    'docx': iter_docx_pages,
+    'pptx': iter_pptx_pages,
+    'xlsx': iter_xlsx_pages,
+}
+
+# Legacy binary Office formats (doc, ppt, xls) are not read, their
+# extraction is marked unsupported
+SUPPORTED_TYPES = set(PAGE_READERS)
+
+
+def extract_batches(path, file_type, batch_size, max_pages, batches, timeout):
+    """Read up to max_pages pages and put them on batches, batch_size at a time.
+
+    Each batch is put as (texts, total_pages), and None once reading stops,
+    whether it finished or failed. The file is opened once and read by a
+    single reader, so every batch carries on from where the last one
+    stopped. A consumer that stops taking batches for timeout seconds ends
+    the read.
+    """
+    try:
+        total = count_pages(path, file_type)
+        pages = PAGE_READERS[file_type](path)
+        page = 0
+        while page < max_pages:
+            count = min(batch_size, max_pages - page)
+            texts = list(islice(pages, count))
+            batches.put((texts, total), timeout=timeout)
+            page += len(texts)
+            if len(texts) < count:
+                break
+    finally:
+        batches.put(None, timeout=timeout)
@@ -112,3 +112,19 @@ class CollaborationForm(FlaskForm):
         user = User.query.filter_by(email=collaborator_email.data).first()
         if not user:
             raise ValidationError('No user found with this email. Please check the email and try again.')
+
+class BulkCollaborationForm(FlaskForm):
+    collaborator_emails = TextAreaField('Collaborator Emails', validators=[Optional()])
+    csv_file = FileField('CSV File', validators=[
+        FileAllowed(['csv'], 'CSV files only!')
+    ])
+    permission = SelectField('Permission', choices=[
+        ('view', 'View Only'), 
+        ('edit', 'Edit'), 
+        ('comment', 'Comment')
+    ], validators=[DataRequired()])
+    submit = SubmitField('Share')
+    
+    def validate_collaborator_emails(self, collaborator_emails):
+        if not collaborator_emails.data and not self.csv_file.data:
+            raise ValidationError('Enter at least one email or upload a CSV file.')
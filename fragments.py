@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, render_template, request
+from markupsafe import Markup
+
+# Process-wide LRU of rendered template fragments. Keys include everything
+# a fragment depends on (for documents, the ID and last_modified), so
+# entries never go stale and only need evicting for space.
+_fragment_cache = OrderedDict()
+_fragment_cache_lock = Lock()
+
+
+def render_fragment(template_name, *key, **context):
+    """Render a partial template, reusing the HTML when the key was seen before.
+
+    key must identify every input the partial reads from context, including
+    any per-user values such as permissions; a cached fragment is returned
+    as is, without evaluating the template. Partials rendered this way must
+    not read current_user or other request state outside their key.
+    """
+    size = current_app.config['FRAGMENT_CACHE_SIZE']
+    if not size:
+        return Markup(render_template(template_name, **context))
+
+    # URLs in the fragment depend on where the app is mounted
+    cache_key = (template_name, request.script_root) + key
+
+    with _fragment_cache_lock:
+        html = _fragment_cache.get(cache_key)
+        if html is not None:
+            _fragment_cache.move_to_end(cache_key)
+            return html
+
+    html = Markup(render_template(template_name, **context))
+
+    with _fragment_cache_lock:
+        _fragment_cache[cache_key] = html
+        while len(_fragment_cache) > size:
+            _fragment_cache.popitem(last=False)
+
+    return html
+
+
+def init_app(app):
+    """Make render_fragment() available in templates."""
+    app.jinja_env.globals['render_fragment'] = render_fragment
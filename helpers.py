@@ -0,0 +1,30 @@
+import os
+import secrets
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from uploads import is_allowed_extension
+
+
+def allowed_file(filename):
+    """Check an uploaded document's filename against ALLOWED_EXTENSIONS."""
+    return is_allowed_extension(filename)
+
+
+def get_file_type(filename):
+    """The lower-cased extension of a filename, without the dot."""
+    return filename.rsplit('.', 1)[1].lower()
+
+
+def save_file(file, folder):
+    """Save an uploaded file under folder with a random prefix.
+
+    folder is relative to the app root. Returns (filename, file_path),
+    the name stored on the model and the absolute path it was written to.
+    """
+    filename = f'{secrets.token_hex(8)}_{secure_filename(file.filename)}'
+    file_path = os.path.join(current_app.root_path, folder, filename)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    file.save(file_path)
+    return filename, file_path
@@ -0,0 +1,58 @@
+"""Image derivatives made with Pillow.
+
+These functions run in worker processes, so this module only imports the
+standard library and Pillow, never the app.
+"""
+import os
+import textwrap
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+WEBP_QUALITY = 80
+
+PREVIEW_MARGIN = 12
+PREVIEW_LINE_WIDTH = 40  # characters
+PREVIEW_LINE_HEIGHT = 12  # pixels
+
+
+def _save(image, path):
+    """Write an image atomically, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.part'
+    image.save(temporary, 'WEBP', quality=WEBP_QUALITY, method=4)
+    os.replace(temporary, path)
+
+
+def make_thumbnails(source, destinations):
+    """Write square, center-cropped thumbnails of an image.
+
+    destinations maps each pixel size to the path to write it to. The
+    source is decoded once at a reduced scale for the largest size.
+    """
+    with Image.open(source) as image:
+        largest = max(destinations)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for size, path in destinations.items():
+            _save(ImageOps.fit(image, (size, size), Image.LANCZOS), path)
+
+
+def render_text_preview(text, path, size):
+    """Draw the start of a page of text as a small page image."""
+    width, height = size
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+
+    lines = []
+    for paragraph in text.splitlines():
+        lines.extend(textwrap.wrap(paragraph, PREVIEW_LINE_WIDTH) or [''])
+    visible = (height - 2 * PREVIEW_MARGIN) // PREVIEW_LINE_HEIGHT
+
+    y = PREVIEW_MARGIN
+    for line in lines[:visible]:
+        draw.text((PREVIEW_MARGIN, y), line, fill=(60, 60, 60), font=font)
+        y += PREVIEW_LINE_HEIGHT
+
+    draw.rectangle([0, 0, width - 1, height - 1], outline=(220, 220, 220))
+    _save(image, path)
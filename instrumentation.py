@@ -0,0 +1,244 @@
+import time
+from threading import Lock
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Per request measurements, (metric name, help text, buckets)
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Wall time spent handling the request.', SECONDS_BUCKETS),
+    ('http_request_sql_queries', 'SQL statements executed by the request.', QUERY_COUNT_BUCKETS),
+    ('http_request_sql_duration_seconds', 'Time spent executing SQL statements.', SECONDS_BUCKETS),
+    ('http_request_template_duration_seconds', 'Time spent rendering templates.', SECONDS_BUCKETS)
+)
+
+
+class Histogram:
+    """Bucketed observations with their count and sum."""
+
+    def __init__(self, buckets):
+        self.bounds = buckets
+        self.buckets = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[next(
+            (i for i, bound in enumerate(self.bounds) if value <= bound),
+            len(self.bounds)
+        )] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, ending with +Inf."""
+        total = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.buckets):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """Per endpoint request timings for this process.
+
+    Like the pool metrics, every gunicorn worker aggregates its own
+    requests; the scraper sums them across workers.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.requests = {}
+            self.response_bytes = {}
+
+    def record(self, endpoint, status, observations, response_bytes):
+        with self._lock:
+            histograms = self.histograms.get(endpoint)
+            if histograms is None:
+                histograms = self.histograms[endpoint] = {
+                    name: Histogram(buckets) for name, _, buckets in HISTOGRAMS
+                }
+            for name, value in observations.items():
+                histograms[name].observe(value)
+
+            self.requests[endpoint, status] = self.requests.get((endpoint, status), 0) + 1
+            self.response_bytes[endpoint] = self.response_bytes.get(endpoint, 0) + response_bytes
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, help_text, _ in HISTOGRAMS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, histograms in sorted(self.histograms.items()):
+                    histogram = histograms[name]
+                    label = f'endpoint="{_escape(endpoint)}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+            lines += ['# HELP http_requests_total Requests handled.', '# TYPE http_requests_total counter']
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",status="{status}"}} {count}')
+
+            lines += ['# HELP http_response_bytes_total Response body bytes sent.', '# TYPE http_response_bytes_total counter']
+            for endpoint, total in sorted(self.response_bytes.items()):
+                lines.append(f'http_response_bytes_total{{endpoint="{_escape(endpoint)}"}} {total}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_log_metrics(dropped):
+    """The logs.dropped_records() count in the Prometheus text format."""
+    return (
+        '# HELP log_records_dropped_total Log records dropped because the log queue was full.\n'
+        '# TYPE log_records_dropped_total counter\n'
+        f'log_records_dropped_total {dropped}\n'
+    )
+
+
+def render_pool_metrics(snapshot):
+    """A connection_pool.metrics snapshot in the Prometheus text format."""
+    checkouts = snapshot['checkouts']
+    lines = ['# HELP db_pool_checkout_seconds Time spent waiting for a pooled connection.', '# TYPE db_pool_checkout_seconds histogram']
+    for bound, count in checkouts['wait_seconds_buckets'].items():
+        lines.append(f'db_pool_checkout_seconds_bucket{{le="{bound}"}} {count}')
+    lines.append(f'db_pool_checkout_seconds_sum {checkouts["wait_seconds_total"]}')
+    lines.append(f'db_pool_checkout_seconds_count {checkouts["count"]}')
+
+    counters = [('db_pool_checkout_timeouts_total', 'Checkouts that gave up waiting.', checkouts['timeouts'])]
+    counters += [
+        (f'db_pool_connections_{name}_total', f'Connections {name}.', count)
+        for name, count in snapshot['connections'].items()
+    ]
+    for name, help_text, value in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {value}']
+
+    for name in ('size', 'checked_out', 'checked_in', 'overflow'):
+        if name in snapshot['pool']:
+            lines += [f'# TYPE db_pool_{name} gauge', f'db_pool_{name} {snapshot["pool"][name]}']
+
+    return '\n'.join(lines) + '\n'
+
+
+def _current():
+    """The measurements of the request being handled, if any."""
+    return g.get('request_metrics') if has_app_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    if current is not None and conn.info.get('query_start'):
+        current['http_request_sql_queries'] += 1
+        current['http_request_sql_duration_seconds'] += time.perf_counter() - conn.info['query_start'].pop()
+
+
+def _before_render(sender, template, context, **extra):
+    current = _current()
+    if current is not None:
+        # Fragments render templates from inside a template, only the
+        # outermost render is timed
+        if not current['template_depth']:
+            current['template_start'] = time.perf_counter()
+        current['template_depth'] += 1
+
+
+def _after_render(sender, template, context, **extra):
+    current = _current()
+    if current is not None and current['template_depth']:
+        current['template_depth'] -= 1
+        if not current['template_depth']:
+            current['http_request_template_duration_seconds'] += time.perf_counter() - current['template_start']
+
+
+def _start_request():
+    g.request_metrics = {
+        'start': time.perf_counter(),
+        'http_request_sql_queries': 0,
+        'http_request_sql_duration_seconds': 0.0,
+        'http_request_template_duration_seconds': 0.0,
+        'template_depth': 0,
+        'template_start': 0.0
+    }
+
+
+def _record_response(response):
+    """Note the status and body size; files from send_from_directory carry a Content-Length.
+
+    A streamed body is generated after the request has been torn down, so
+    those requests are recorded when the server closes the response
+    instead. Files are passed straight through to the server, which skips
+    close callbacks, and are still recorded at teardown.
+    """
+    current = _current()
+    if current is not None:
+        current['status'] = response.status_code
+        current['bytes'] = response.content_length or 0
+        if response.is_streamed and not response.direct_passthrough:
+            current['streamed'] = True
+            endpoint = request.endpoint or 'unmatched'
+            response.call_on_close(lambda: _record(endpoint, current))
+    return response
+
+
+def _finish_request(exc):
+    """Record the request, unless its streamed body is still to be sent."""
+    current = g.pop('request_metrics', None)
+    if current is None or current.get('streamed'):
+        return
+    _record(request.endpoint or 'unmatched', current)
+
+
+def _record(endpoint, current):
+    """Add a finished request to the metrics.
+
+    SQL and template time are only counted while the request context is
+    up, so work done by a stream's generator adds to its duration alone.
+    """
+    metrics.record(
+        endpoint,
+        current.get('status', 500),
+        {
+            'http_request_duration_seconds': time.perf_counter() - current['start'],
+            'http_request_sql_queries': current['http_request_sql_queries'],
+            'http_request_sql_duration_seconds': current['http_request_sql_duration_seconds'],
+            'http_request_template_duration_seconds': current['http_request_template_duration_seconds']
+        },
+        current.get('bytes', 0)
+    )
+
+
+def init_app(app):
+    """Measure every request when REQUEST_METRICS is enabled."""
+    if not app.config['REQUEST_METRICS']:
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -0,0 +1,154 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class InlineBackend:
+    """Runs jobs immediately in the caller, for tests and the CLI."""
+
+    def __init__(self, app, job_queue):
+        self.job_queue = job_queue
+
+    def enqueue(self, name, kwargs):
+        self.job_queue.run(name, kwargs)
+
+
+class ThreadBackend:
+    """Runs jobs on a background thread owned by the current process.
+
+    The thread is started on the first enqueue, so each gunicorn worker gets
+    its own after forking. Jobs still waiting when the process exits are
+    given a few seconds to finish and are lost after that; use a broker
+    backend when that matters.
+    """
+
+    def __init__(self, app, job_queue):
+        self.app = app
+        self.job_queue = job_queue
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, name, kwargs):
+        self._ensure_worker()
+        self._jobs.put((name, kwargs))
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._work, name='job-queue', daemon=True)
+            self._thread.start()
+            atexit.register(self._drain)
+
+    def _work(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            name, kwargs = item
+            with self.app.app_context():
+                try:
+                    self.job_queue.run(name, kwargs)
+                except Exception:
+                    logger.exception('Job %s failed', name)
+            self._jobs.task_done()
+
+    def _drain(self, timeout=5):
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+
+BACKENDS = {
+    'inline': InlineBackend,
+    'thread': ThreadBackend,
+}
+
+
+class JobQueue:
+    """Hands registered jobs to the backend named by JOB_QUEUE_BACKEND.
+
+    Backends are 'inline', 'thread' or the import path of a class taking
+    (app, job_queue) with an enqueue(name, kwargs) method, which is how a
+    production broker is plugged in. Job arguments must be JSON
+    serializable so that any backend can carry them.
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['JOB_QUEUE_BACKEND']
+        backend_class = BACKENDS[backend] if backend in BACKENDS else import_string(backend)
+        self.backend = backend_class(app, self)
+        app.extensions['job_queue'] = self
+
+    def job(self, func):
+        """Register a function as a job under its own name."""
+        self.handlers[func.__name__] = func
+        return func
+
+    def enqueue(self, name, **kwargs):
+        self.backend.enqueue(name, kwargs)
+
+    def run(self, name, kwargs):
+        self.handlers[name](**kwargs)
+
+
+job_queue = JobQueue()
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+_manager = None
+_manager_pid = None
+
+
+def process_pool():
+    """The process pool jobs hand CPU-bound work to, started on first use.
+
+    Each process gets its own pool of PROCESS_POOL_WORKERS. Workers are
+    spawned rather than forked, as the pool is created from the job thread
+    of a multi-threaded server, so functions sent to it should live in
+    modules that do not import the app.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config['PROCESS_POOL_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def process_queue(maxsize=0):
+    """A queue that process pool workers can put results on while they run.
+
+    The queues live in a manager process, started on first use like the
+    pool, so they can be passed to functions submitted to the pool.
+    """
+    global _manager, _manager_pid
+    with _pool_lock:
+        if _manager is None or _manager_pid != os.getpid():
+            _manager = multiprocessing.get_context('spawn').Manager()
+            _manager_pid = os.getpid()
+            atexit.register(_manager.shutdown)
+        return _manager.Queue(maxsize)
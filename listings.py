@@ -0,0 +1,80 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+
+from app import db
+from models import Document, PublicListing
+
+# Characters of the description kept in a listing
+SUMMARY_LENGTH = 200
+
+
+def _listing_values(document, owner):
+    return {
+        'document_id': document.id,
+        'title': document.title,
+        'summary': (document.description or '')[:SUMMARY_LENGTH] or None,
+        'file_type': document.file_type,
+        'file_size': document.file_size,
+        'uploaded_at': document.uploaded_at,
+        'owner_id': owner.id,
+        'owner_username': owner.username,
+        'owner_role': owner.role,
+        'owner_college': owner.college,
+        'owner_field': owner.field
+    }
+
+
+def refresh_listing(document):
+    """Add, update or remove a document's listing to match the document.
+
+    Call after any change to a document's title, description or is_public
+    flag; the caller commits.
+    """
+    if not document.is_public:
+        remove_listing(document.id)
+        return
+    db.session.merge(PublicListing(**_listing_values(document, document.owner)))
+
+
+def remove_listing(document_id):
+    """Drop a document from the public listing, if it is there."""
+    PublicListing.query.filter_by(document_id=document_id).delete(synchronize_session=False)
+
+
+def refresh_owner_listings(user):
+    """Copy a user's changed profile into the listings of their public documents."""
+    PublicListing.query.filter_by(owner_id=user.id).update({
+        PublicListing.owner_username: user.username,
+        PublicListing.owner_role: user.role,
+        PublicListing.owner_college: user.college,
+        PublicListing.owner_field: user.field
+    }, synchronize_session=False)
+
+
+def rebuild_listings(batch_size=1000):
+    """Rebuild the public listing from the documents, one batch per commit.
+
+    Returns the number of public documents listed.
+    """
+    listed = 0
+    last_id = 0
+
+    while True:
+        documents = Document.query.filter(Document.id > last_id).options(
+            joinedload(Document.owner)
+        ).order_by(Document.id).limit(batch_size).all()
+        if not documents:
+            break
+
+        PublicListing.query.filter(
+            PublicListing.document_id.in_([document.id for document in documents])
+        ).delete(synchronize_session=False)
+        rows = [_listing_values(document, document.owner) for document in documents if document.is_public]
+        if rows:
+            db.session.execute(insert(PublicListing), rows)
+
+        last_id = documents[-1].id
+        listed += len(rows)
+        db.session.commit()
+
+    return listed
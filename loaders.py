@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import Document, Notification, Collaboration, PublicListing
+from notifications import unread_count as count_unread
+
+
+def load_dashboard(user_id, notification_limit=5):
+    """Load the dashboard data for a user in a fixed number of queries."""
+    user_documents = Document.query.filter_by(user_id=user_id).order_by(Document.uploaded_at.desc()).all()
+
+    # Shared documents and their owners come back in a single joined SELECT,
+    # so the template can read document.owner without a query per row
+    shared_documents = Document.query.join(
+        Collaboration, Collaboration.document_id == Document.id
+    ).filter(
+        Collaboration.user_id == user_id
+    ).options(
+        joinedload(Document.owner)
+    ).order_by(Collaboration.id).all()
+
+    # Unread notification previews, skipped when the counter says there are none
+    unread_count = count_unread(user_id)
+    notifications = Notification.query.filter_by(
+        user_id=user_id,
+        is_read=False
+    ).order_by(Notification.created_at.desc()).limit(notification_limit).all() if unread_count else []
+
+    return {
+        'user_documents': user_documents,
+        'shared_documents': shared_documents,
+        'notifications': notifications,
+        'document_count': len(user_documents),
+        'collaboration_count': len(shared_documents),
+        'unread_count': unread_count
+    }
+
+
+def encode_cursor(notification):
+    """Build the keyset cursor pointing just past a notification."""
+    return f"{notification.created_at.isoformat()}_{notification.id}"
+
+
+def decode_cursor(cursor):
+    """Split a keyset cursor into its (created_at, id) pair."""
+    created_at, notification_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(created_at), int(notification_id)
+
+
+def load_notifications_page(user_id, is_read, cursor=None, limit=20):
+    """Load one page of a user's read or unread notifications, newest first.
+
+    Pages are addressed by a (created_at, id) cursor rather than an offset,
+    so every page costs the same index range scan however deep it is.
+    Returns the notifications and the cursor for the next page, or None
+    when there are no more.
+    """
+    query = Notification.query.filter_by(user_id=user_id, is_read=is_read)
+
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < notification_id)
+        ))
+
+    # Fetch one extra row to find out whether another page follows
+    notifications = query.order_by(
+        Notification.created_at.desc(),
+        Notification.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        next_cursor = encode_cursor(notifications[-1])
+
+    return notifications, next_cursor
+
+
+def load_public_page(role=None, college=None, field=None, cursor=None, limit=20):
+    """Load one page of the public document listing, newest first.
+
+    Reads only PublicListing, through the index matching the filter, with
+    the same keyset cursors as the notification pages. Returns the
+    listings and the cursor for the next page, or None.
+    """
+    query = PublicListing.query
+    if role:
+        query = query.filter_by(owner_role=role)
+    if college:
+        query = query.filter_by(owner_college=college)
+    if field:
+        query = query.filter_by(owner_field=field)
+
+    if cursor:
+        uploaded_at, document_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            PublicListing.uploaded_at < uploaded_at,
+            and_(PublicListing.uploaded_at == uploaded_at, PublicListing.document_id < document_id)
+        ))
+
+    listings = query.order_by(
+        PublicListing.uploaded_at.desc(),
+        PublicListing.document_id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(listings) > limit:
+        listings = listings[:limit]
+        next_cursor = f"{listings[-1].uploaded_at.isoformat()}_{listings[-1].document_id}"
+
+    return listings, next_cursor
@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Incoming X-Request-ID values are kept only if they look like an ID
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else was passed in extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields alongside the message."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+FORMATTERS = {
+    'json': JSONFormatter,
+    'text': lambda: logging.Formatter('%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s')
+}
+
+
+class BackgroundHandler(QueueHandler):
+    """Hands records to a listener thread that formats and writes them.
+
+    The request thread only merges the message arguments and tags the
+    record with the request ID; JSON encoding, tracebacks and I/O happen
+    on the listener. The queue is bounded, and when the listener cannot
+    keep up records are dropped and counted rather than blocking the
+    worker. Like the job thread, the listener is started on first use so
+    that each gunicorn worker gets its own after forking.
+    """
+
+    def __init__(self, handler, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.handler = handler
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        record.request_id = current_request_id()
+        # Arguments may be objects that change or lazy load after the call,
+        # so the message is fixed here; the traceback is formatted later
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listener = QueueListener(self.queue, self.handler, respect_handler_level=True)
+            self._listener.start()
+            atexit.register(self.close)
+
+    def close(self):
+        """Write out the queued records and stop the listener."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        super().close()
+
+
+def current_request_id():
+    """The ID of the request being handled, or None outside a request."""
+    return g.get('request_id') if has_request_context() else None
+
+
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+
+
+def _return_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def dropped_records():
+    """Records this process dropped because the log queue was full."""
+    return sum(handler.dropped for handler in logging.getLogger().handlers if isinstance(handler, BackgroundHandler))
+
+
+def init_app(app):
+    """Send all logging through one BackgroundHandler on the root logger.
+
+    LOG_LEVEL sets the root level and LOG_LEVELS overrides it per logger,
+    so SQLAlchemy or Werkzeug can be turned up on their own. Each request
+    gets an ID, taken from X-Request-ID when a proxy sets one, that is
+    added to its log records and returned in the response.
+    """
+    log_format = app.config['LOG_FORMAT']
+    if log_format not in FORMATTERS:
+        raise ValueError(f'LOG_FORMAT must be one of {", ".join(FORMATTERS)}, not {log_format!r}')
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(FORMATTERS[log_format]())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, BackgroundHandler):
+            root.removeHandler(handler)
+            handler.close()
+    root.addHandler(BackgroundHandler(stream, app.config['LOG_QUEUE_SIZE']))
+    root.setLevel(app.config['LOG_LEVEL'].upper())
+    for name, level in app.config['LOG_LEVELS'].items():
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    # Flask's own handler would format on the request thread, its records
+    # reach the root handler instead
+    app.logger.removeHandler(default_handler)
+
+    app.before_request(_assign_request_id)
+    app.after_request(_return_request_id)
@@ -10,6 +10,8 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'student', 'professor', 'company'
     profile_image = db.Column(db.String(120), default='default.jpg')
+    avatar_hash = db.Column(db.String(64))  # SHA-256 of profile_image once its thumbnails exist
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # kept in step by notifications.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Role-specific fields
@@ -39,7 +41,9 @@ class Document(db.Model):
     description = db.Column(db.Text)
     file_path = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(10), nullable=False)
-    file_size = db.Column(db.Integer, nullable=False)  # in bytes
+    file_size = db.Column(db.BigInteger, nullable=False)  # in bytes
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file contents
+    preview_path = db.Column(db.String(100))  # first-page preview, relative to PREVIEW_FOLDER
     is_public = db.Column(db.Boolean, default=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_modified = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -50,10 +54,66 @@ class Document(db.Model):
     # Relationships
     collaborations = db.relationship('Collaboration', backref='document', lazy='dynamic')
     
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_document_user_id_uploaded_at', 'user_id', 'uploaded_at'),  # Owner's documents, newest first
+        db.Index('ix_document_content_hash', 'content_hash'),  # Documents sharing a stored blob
+    )
+    
     def __repr__(self):
         return f'<Document {self.title}>'
 
 
+class DocumentBlob(db.Model):
+    content_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the file contents
+    file_path = db.Column(db.String(255), nullable=False)  # relative to DOCUMENT_FOLDER
+    file_size = db.Column(db.BigInteger, nullable=False)  # in bytes
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # Documents pointing at this blob
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DocumentBlob {self.content_hash}>'
+
+
+class SearchTerm(db.Model):
+    term = db.Column(db.String(64), primary_key=True)  # normalized token
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    weight = db.Column(db.Integer, nullable=False, default=1)  # occurrences, title hits count extra
+    
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_search_term_document_id', 'document_id'),  # Reindexing and deleting a document
+    )
+    
+    def __repr__(self):
+        return f'<SearchTerm {self.term} in {self.document_id}>'
+
+
+class TextExtraction(db.Model):
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed', 'unsupported'
+    pages_done = db.Column(db.Integer, nullable=False, default=0)
+    pages_total = db.Column(db.Integer)  # None when the format has no page count
+    error = db.Column(db.String(255))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    document = db.relationship('Document', backref=db.backref('text_extraction', uselist=False))
+    
+    def __repr__(self):
+        return f'<TextExtraction {self.document_id} {self.status}>'
+
+
+class TextChunk(db.Model):
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)  # order of the chunk in the document
+    page = db.Column(db.Integer, nullable=False)  # page, slide or sheet the chunk came from
+    content = db.Column(db.Text, nullable=False)
+    
+    def __repr__(self):
+        return f'<TextChunk {self.document_id}:{self.position}>'
+
+
 class Collaboration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -61,6 +121,12 @@ class Collaboration(db.Model):
     permission = db.Column(db.String(20), default='view')  # 'view', 'edit', 'comment'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Indexes and constraints
+    __table_args__ = (
+        db.UniqueConstraint('document_id', 'user_id', name='uq_collaboration_document_id_user_id'),  # One share per user and document
+        db.Index('ix_collaboration_user_id_document_id', 'user_id', 'document_id'),  # Documents shared with a user
+    )
+    
     def __repr__(self):
         return f'<Collaboration {self.user_id} on {self.document_id}>'
 
@@ -78,5 +144,56 @@ class Notification(db.Model):
     related_document = db.relationship('Document', foreign_keys=[related_document_id])
     related_user = db.relationship('User', foreign_keys=[related_user_id], backref=db.backref('related_notifications', lazy='dynamic'))
     
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_notification_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),  # Read/unread lists, newest first
+    )
+    
     def __repr__(self):
         return f'<Notification for {self.user_id}>'
+
+
+class PublicListing(db.Model):
+    """A public document with its owner's details, copied for the discover feed."""
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    title = db.Column(db.String(120), nullable=False)
+    summary = db.Column(db.String(200))  # start of the description
+    file_type = db.Column(db.String(10), nullable=False)
+    file_size = db.Column(db.BigInteger, nullable=False)
+    uploaded_at = db.Column(db.DateTime, nullable=False)
+    
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    owner_username = db.Column(db.String(64), nullable=False)
+    owner_role = db.Column(db.String(20), nullable=False)
+    owner_college = db.Column(db.String(120))
+    owner_field = db.Column(db.String(120))
+    
+    # Indexes, each ending in the feed's (uploaded_at, document_id) order
+    __table_args__ = (
+        db.Index('ix_public_listing_uploaded_at', 'uploaded_at', 'document_id'),  # Unfiltered feed
+        db.Index('ix_public_listing_role', 'owner_role', 'uploaded_at', 'document_id'),  # Filtered by role
+        db.Index('ix_public_listing_college', 'owner_college', 'uploaded_at', 'document_id'),  # Filtered by college
+        db.Index('ix_public_listing_field', 'owner_field', 'uploaded_at', 'document_id'),  # Filtered by field
+        db.Index('ix_public_listing_owner_id', 'owner_id'),  # Refreshing an owner's listings
+    )
+    
+    def __repr__(self):
+        return f'<PublicListing {self.document_id}>'
+
+
+class NotificationArchive(db.Model):
+    """Read notifications past NOTIFICATION_RETENTION_DAYS, moved out of the hot table."""
+    id = db.Column(db.Integer, primary_key=True)  # the original notification id
+    user_id = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    related_document_id = db.Column(db.Integer)  # no foreign keys, so documents and users can still be deleted
+    related_user_id = db.Column(db.Integer)
+    
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_notification_archive_user_id_created_at', 'user_id', 'created_at'),  # A user's history, newest first
+    )
+    
+    def __repr__(self):
+        return f'<NotificationArchive for {self.user_id}>'
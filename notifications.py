@@ -0,0 +1,314 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, func, insert, select, update
+
+from app import db
+from jobs import job_queue
+from models import User, Notification, NotificationArchive
+from pubsub import pubsub
+
+
+def notify_users(user_ids, content, related_document_id=None, related_user_id=None):
+    """Queue the same notification for a list of users.
+
+    The rows are written by fan_out_notifications() off the request path,
+    so sharing with a whole class costs the request a single enqueue.
+    """
+    job_queue.enqueue(
+        'fan_out_notifications',
+        user_ids=list(user_ids),
+        content=content,
+        related_document_id=related_document_id,
+        related_user_id=related_user_id
+    )
+
+
+@job_queue.job
+def fan_out_notifications(user_ids, content, related_document_id=None, related_user_id=None):
+    """Insert one notification per user, a batch of users per INSERT.
+
+    Each recipient's unread counter is raised in the same transaction, and
+    once committed the new rows are published to the recipients' streams.
+    Returns the IDs of the inserted notifications.
+    """
+    # Whole seconds, as MySQL stores them, so the rows can be found again by it
+    created_at = datetime.utcnow().replace(microsecond=0)
+    batch_size = current_app.config['NOTIFICATION_BATCH_SIZE']
+    notification_ids = []
+
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        notification_ids += _insert_notifications(notification_ids[-1] if notification_ids else 0, [
+            {
+                'user_id': user_id,
+                'content': content,
+                'is_read': False,
+                'created_at': created_at,
+                'related_document_id': related_document_id,
+                'related_user_id': related_user_id
+            }
+            for user_id in batch
+        ])
+        _add_unread(Counter(batch))
+
+    db.session.commit()
+
+    for start in range(0, len(notification_ids), batch_size):
+        _publish_new(notification_ids[start:start + batch_size])
+    return notification_ids
+
+
+def _insert_notifications(after_id, rows):
+    """Insert notification rows sharing everything but user_id and return their IDs.
+
+    Databases with executemany RETURNING (SQLite, PostgreSQL, MariaDB) do it
+    in one statement. MySQL has no RETURNING, so there the rows still go in
+    with one multi-row INSERT and their IDs are read back with one query on
+    the recipients, content and created_at, in the caller's transaction.
+    IDs up to after_id belong to earlier batches and are left out.
+    """
+    connection = db.session.connection()
+    if connection.dialect.insert_executemany_returning:
+        return list(connection.execute(insert(Notification).returning(Notification.id), rows).scalars())
+
+    connection.execute(insert(Notification), rows)
+    first = rows[0]
+    return list(connection.execute(
+        select(Notification.id).where(
+            Notification.id > after_id,
+            Notification.user_id.in_({row['user_id'] for row in rows}),
+            Notification.created_at == first['created_at'],
+            Notification.content == first['content'],
+            Notification.related_document_id == first['related_document_id'],
+            Notification.related_user_id == first['related_user_id']
+        ).order_by(Notification.id)
+    ).scalars())
+
+
+def user_channel(user_id):
+    """The pub/sub channel a user's notification events are sent on."""
+    return f'notifications:{user_id}'
+
+
+def _publish_new(notification_ids):
+    """Publish a batch of just created notifications to their recipients.
+
+    Rows are found by ID rather than by creation time, which MySQL stores
+    without the fractional seconds.
+    """
+    rows = db.session.query(
+        Notification.id,
+        Notification.user_id,
+        Notification.content,
+        Notification.created_at,
+        User.unread_notifications
+    ).join(User, User.id == Notification.user_id).filter(
+        Notification.id.in_(notification_ids),
+        Notification.is_read == False  # noqa: E712
+    )
+    pubsub.publish_many([
+        (user_channel(user_id), {
+            'event': 'notification',
+            'id': notification_id,
+            'content': content,
+            'created_at': created_at.strftime('%B %d, %Y at %H:%M'),
+            'unread_count': unread
+        })
+        for notification_id, user_id, content, created_at, unread in rows
+    ])
+
+
+def publish_unread_count(user_id):
+    """Tell a user's open pages their unread count changed."""
+    pubsub.publish(user_channel(user_id), {'event': 'unread', 'unread_count': unread_count(user_id)})
+
+
+def _add_unread(counts):
+    """Raise users' unread counters, given a mapping of user_id -> new rows.
+
+    Users with the same number of new rows share one UPDATE, so a fan-out
+    usually costs a single statement.
+    """
+    by_change = {}
+    for user_id, change in counts.items():
+        by_change.setdefault(change, []).append(user_id)
+
+    for change, user_ids in by_change.items():
+        db.session.execute(
+            update(User).where(User.id.in_(user_ids)).values(
+                unread_notifications=User.unread_notifications + change
+            ).execution_options(synchronize_session=False)
+        )
+
+
+def unread_count(user_id):
+    """A user's unread notification count, read from the counter column."""
+    return db.session.query(User.unread_notifications).filter_by(id=user_id).scalar() or 0
+
+
+def mark_notifications_read(user_id, notification_ids=None):
+    """Mark a user's unread notifications as read, all of them by default.
+
+    Only rows that were still unread are counted, so marking the same
+    notification twice, or from two requests at once, lowers the counter
+    once. The caller commits. Returns the number of notifications marked.
+    """
+    query = Notification.query.filter_by(user_id=user_id, is_read=False)
+    if notification_ids is not None:
+        query = query.filter(Notification.id.in_(notification_ids))
+
+    marked = query.update({Notification.is_read: True}, synchronize_session=False)
+    if marked:
+        _subtract_unread(user_id, marked)
+    return marked
+
+
+def _subtract_unread(user_id, count):
+    """Lower a user's unread counter; one that has drifted low stops at zero."""
+    db.session.execute(
+        update(User).where(User.id == user_id).values(unread_notifications=case(
+            (User.unread_notifications > count, User.unread_notifications - count),
+            else_=0
+        )).execution_options(synchronize_session=False)
+    )
+
+
+@job_queue.job
+def reconcile_unread_counts(batch_size=1000):
+    """Repair unread counters that have drifted from the notification rows.
+
+    Counters are recomputed for a batch of users per transaction and only
+    rows that differ are written. Returns the number of users repaired.
+    """
+    repaired = 0
+    last_id = 0
+
+    while True:
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(batch_size)]
+        if not user_ids:
+            break
+
+        counted = select(func.count(Notification.id)).where(
+            Notification.user_id == User.id,
+            Notification.is_read == False  # noqa: E712
+        ).scalar_subquery()
+        result = db.session.execute(
+            update(User).where(
+                User.id.in_(user_ids),
+                User.unread_notifications != counted
+            ).values(unread_notifications=counted).execution_options(synchronize_session=False)
+        )
+        repaired += result.rowcount
+
+        last_id = user_ids[-1]
+        db.session.commit()
+
+    return repaired
+
+
+@job_queue.job
+def compact_notifications(retention_days=None, batch_size=1000):
+    """Coalesce repeated notifications and archive old read ones.
+
+    Read notifications older than retention_days, NOTIFICATION_RETENTION_DAYS
+    by default, are moved to NotificationArchive.
+
+    Users are handled a batch at a time through the (user_id, is_read,
+    created_at) index, and no transaction touches more than batch_size
+    notifications, so locks stay short on a busy table. Returns the number
+    of notifications (coalesced, archived).
+    """
+    if retention_days is None:
+        retention_days = current_app.config['NOTIFICATION_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    coalesced = archived = 0
+    last_id = 0
+
+    while True:
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+            User.id > last_id
+        ).order_by(User.id).limit(batch_size)]
+        if not user_ids:
+            break
+
+        coalesced += _coalesce(user_ids, batch_size)
+        archived += _archive(user_ids, cutoff, batch_size)
+        last_id = user_ids[-1]
+
+    return coalesced, archived
+
+
+def _coalesce(user_ids, batch_size):
+    """Keep only the newest notification per recipient, sender and document.
+
+    Sharing, unsharing and sharing again leaves a trail of notifications
+    about the same document from the same person; only the latest is still
+    worth showing. Unread ones that are dropped come off the counter.
+    """
+    groups = db.session.query(
+        Notification.user_id,
+        Notification.related_user_id,
+        Notification.related_document_id,
+        func.max(Notification.id).label('newest_id')
+    ).filter(
+        Notification.user_id.in_(user_ids),
+        Notification.related_user_id.isnot(None),
+        Notification.related_document_id.isnot(None)
+    ).group_by(
+        Notification.user_id,
+        Notification.related_user_id,
+        Notification.related_document_id
+    ).having(func.count() > 1).subquery()
+
+    coalesced = 0
+    while True:
+        older = db.session.query(Notification.id, Notification.user_id, Notification.is_read).join(groups, and_(
+            Notification.user_id == groups.c.user_id,
+            Notification.related_user_id == groups.c.related_user_id,
+            Notification.related_document_id == groups.c.related_document_id,
+            Notification.id < groups.c.newest_id
+        )).limit(batch_size).all()
+        if not older:
+            return coalesced
+
+        Notification.query.filter(
+            Notification.id.in_([notification_id for notification_id, _, _ in older])
+        ).delete(synchronize_session=False)
+        for user_id, count in Counter(user_id for _, user_id, is_read in older if not is_read).items():
+            _subtract_unread(user_id, count)
+
+        coalesced += len(older)
+        db.session.commit()
+
+
+def _archive(user_ids, cutoff, batch_size):
+    """Move read notifications created before cutoff into NotificationArchive."""
+    columns = ['id', 'user_id', 'content', 'created_at', 'related_document_id', 'related_user_id']
+
+    archived = 0
+    while True:
+        notification_ids = [notification_id for (notification_id,) in db.session.query(Notification.id).filter(
+            Notification.user_id.in_(user_ids),
+            Notification.is_read == True,  # noqa: E712
+            Notification.created_at < cutoff
+        ).limit(batch_size)]
+        if not notification_ids:
+            return archived
+
+        db.session.execute(insert(NotificationArchive).from_select(
+            columns,
+            select(*(getattr(Notification, column) for column in columns)).where(Notification.id.in_(notification_ids))
+        ))
+        Notification.query.filter(Notification.id.in_(notification_ids)).delete(synchronize_session=False)
+
+        archived += len(notification_ids)
+        db.session.commit()
+
+
+def init_app(app):
+    """Make unread_count() available in templates as unread_notification_count()."""
+    app.jinja_env.globals['unread_notification_count'] = unread_count
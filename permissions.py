@@ -0,0 +1,105 @@
+import hmac
+import time
+from functools import wraps
+from threading import Lock
+
+from flask import abort, current_app, g, request
+
+from app import db
+from models import Collaboration
+
+# Collaboration permissions ordered from weakest to strongest
+PERMISSION_LEVELS = {'view': 1, 'comment': 2, 'edit': 3}
+
+# Process-wide cache of (user_id, document_id) -> (permission, expires_at).
+# Invalidation only reaches the current process, so PERMISSION_CACHE_TTL
+# bounds how long another worker can serve a stale answer.
+_permission_cache = {}
+_permission_cache_lock = Lock()
+
+
+def _request_permissions():
+    """Permissions already resolved during the current request."""
+    if 'document_permissions' not in g:
+        g.document_permissions = {}
+    return g.document_permissions
+
+
+def load_document_permissions(user_id, document_ids):
+    """Resolve a user's collaboration permissions for a set of documents.
+
+    Returns a dict mapping each document ID to the collaboration permission
+    ('view', 'comment', 'edit') or None. Results are memoized for the rest
+    of the request and, when PERMISSION_CACHE_TTL is set, in a process-wide
+    TTL cache. Documents missing from both are fetched in a single query.
+    """
+    memo = _request_permissions()
+    ttl = current_app.config['PERMISSION_CACHE_TTL']
+    now = time.monotonic()
+
+    missing = []
+    for document_id in set(document_ids):
+        key = (user_id, document_id)
+        if key in memo:
+            continue
+        if ttl:
+            with _permission_cache_lock:
+                cached = _permission_cache.get(key)
+            if cached and cached[1] > now:
+                memo[key] = cached[0]
+                continue
+        missing.append(document_id)
+
+    if missing:
+        rows = db.session.query(Collaboration.document_id, Collaboration.permission).filter(
+            Collaboration.user_id == user_id,
+            Collaboration.document_id.in_(missing)
+        ).all()
+        found = dict(rows)
+
+        for document_id in missing:
+            memo[(user_id, document_id)] = found.get(document_id)
+
+        if ttl:
+            with _permission_cache_lock:
+                for document_id in missing:
+                    _permission_cache[(user_id, document_id)] = (found.get(document_id), now + ttl)
+
+    return {document_id: memo[(user_id, document_id)] for document_id in document_ids}
+
+
+def has_document_permission(user, document, permission='view'):
+    """Check whether a user may access a document at the given level."""
+    # Owners can do anything and anyone may view a public document
+    if document.user_id == user.id:
+        return True
+    if permission == 'view' and document.is_public:
+        return True
+
+    granted = load_document_permissions(user.id, [document.id])[document.id]
+    if granted is None:
+        return False
+    return PERMISSION_LEVELS.get(granted, 0) >= PERMISSION_LEVELS[permission]
+
+
+def invalidate_document_permission(user_id, document_id):
+    """Forget a cached permission after a collaboration changes."""
+    with _permission_cache_lock:
+        _permission_cache.pop((user_id, document_id), None)
+    _request_permissions().pop((user_id, document_id), None)
+
+
+def internal_only(view):
+    """Limit a view to callers sending INTERNAL_API_TOKEN as a bearer token.
+
+    With no token configured the view answers 404, as if it did not exist.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = current_app.config['INTERNAL_API_TOKEN']
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
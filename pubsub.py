@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from werkzeug.utils import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Messages published to one channel, buffered for a single listener."""
+
+    def __init__(self, backend, channel, maxsize):
+        self.backend = backend
+        self.channel = channel
+        self._messages = queue.Queue(maxsize)
+
+    def put(self, message):
+        # A listener that stops reading loses messages rather than
+        # holding memory or blocking the publisher
+        try:
+            self._messages.put_nowait(message)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """Wait for the next message, or return None after timeout seconds."""
+        try:
+            return self._messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class MemoryBackend:
+    """Delivers messages to subscribers in the current process only.
+
+    Enough for tests and a single server process. When more than one
+    process serves requests, a message published in one is not seen by
+    listeners in another, so use a broker backend such as 'redis'.
+    """
+
+    def __init__(self, app):
+        self.buffer_size = app.config['PUBSUB_BUFFER_SIZE']
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def publish_many(self, messages):
+        for channel, message in messages:
+            self.publish(channel, message)
+
+    def deliver(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.buffer_size)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+
+class RedisBackend(MemoryBackend):
+    """Publishes through Redis so every process sees every message.
+
+    Each process holds a single Redis subscription for all channels and
+    hands messages to its local subscribers, so the number of Redis
+    connections does not grow with the number of listeners. Needs the
+    redis package and PUBSUB_REDIS_URL.
+    """
+
+    def __init__(self, app):
+        import redis
+
+        super().__init__(app)
+        self.prefix = app.config['PUBSUB_CHANNEL_PREFIX']
+        self.client = redis.Redis.from_url(app.config['PUBSUB_REDIS_URL'])
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message))
+
+    def publish_many(self, messages):
+        pipeline = self.client.pipeline(transaction=False)
+        for channel, message in messages:
+            pipeline.publish(self.prefix + channel, json.dumps(message))
+        pipeline.execute()
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def _ensure_listener(self):
+        # Started on first use, so each forked worker gets its own
+        with self._listener_lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='pubsub-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for item in pubsub.listen():
+                    channel = item['channel'].decode()[len(self.prefix):]
+                    self.deliver(channel, json.loads(item['data']))
+            except Exception:
+                logger.exception('Lost the Redis pub/sub connection, reconnecting')
+                time.sleep(1)
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'redis': RedisBackend,
+}
+
+
+class PubSub:
+    """Publishes JSON-serializable messages to named channels.
+
+    The backend is named by PUBSUB_BACKEND: 'memory', 'redis' or the import
+    path of a class taking (app) with publish(), publish_many(), subscribe()
+    and unsubscribe() methods, like the job queue backends.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['PUBSUB_BACKEND']
+        backend_class = BACKENDS[backend] if backend in BACKENDS else import_string(backend)
+        self.backend = backend_class(app)
+        app.extensions['pubsub'] = self
+
+    def publish(self, channel, message):
+        self.backend.publish(channel, message)
+
+    def publish_many(self, messages):
+        """Publish (channel, message) pairs, in one round trip where the backend allows."""
+        self.backend.publish_many(messages)
+
+    def subscribe(self, channel):
+        """Start buffering a channel's messages; close() the subscription when done."""
+        return self.backend.subscribe(channel)
+
+
+pubsub = PubSub()
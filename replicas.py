@@ -0,0 +1,80 @@
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+
+def replica_bind_keys(app):
+    """The SQLALCHEMY_BINDS keys given to SQLALCHEMY_REPLICA_URIS."""
+    return [f'replica_{i}' for i in range(len(app.config['SQLALCHEMY_REPLICA_URIS']))]
+
+
+def use_replica(view):
+    """Send a view's reads to a replica on GET requests.
+
+    Only for views that read on GET. A view that does write anyway still
+    works: the session switches to the primary for the write and stays
+    there until the end of the request.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def _sticky_to_primary():
+    """Whether this browser wrote recently enough that a replica may lag behind."""
+    return session.get('primary_until', 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Routes reads in use_replica views to a replica engine.
+
+    Everything else uses the primary: writes, flushes, reads outside a
+    request, and every statement after this session has written.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            if 'replica' not in self.info:
+                self.info['replica'] = random.choice(replica_bind_keys(current_app))
+            return self._db.engines[self.info['replica']]
+
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        return (
+            has_request_context()
+            and g.get('use_replica', False)
+            and not self.info.get('wrote')
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and bool(current_app.config['SQLALCHEMY_REPLICA_URIS'])
+            and not _sticky_to_primary()
+        )
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(db_session):
+    """Read from the primary for a while after this browser's writes.
+
+    Covers the redirect after a form post, when a lagging replica would
+    show the page as it was before the change.
+    """
+    if db_session.info.get('wrote') and has_request_context() and current_app.config['SQLALCHEMY_REPLICA_URIS']:
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def init_app(app):
+    """Add SQLALCHEMY_REPLICA_URIS to the binds; must run before db.init_app()."""
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.update(zip(replica_bind_keys(app), app.config['SQLALCHEMY_REPLICA_URIS']))
+    app.config['SQLALCHEMY_BINDS'] = binds
@@ -1,52 +1,74 @@
+import json
 import os
+import time
 from datetime import datetime
-from flask import render_template, url_for, flash, redirect, request, abort, send_from_directory
+from flask import Blueprint, Response, current_app, render_template, url_for, flash, redirect, request, abort, jsonify
 from flask_login import login_user, current_user, logout_user, login_required
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
-from app import app, db
+from app import db
 from forms import (
     RoleSelectionForm, LoginForm, RegistrationForm, UpdateProfileForm,
-    UploadDocumentForm, EditDocumentForm, CollaborationForm
+    UploadDocumentForm, EditDocumentForm, CollaborationForm, BulkCollaborationForm
 )
 from models import User, Document, Notification, Collaboration
-from utils import allowed_file, save_file, get_file_size, get_file_type, create_notification, has_permission
-
-
-@app.route('/')
+from helpers import allowed_file, save_file, get_file_type
+from permissions import has_document_permission, invalidate_document_permission, internal_only
+from user_cache import invalidate_user
+from loaders import load_dashboard, load_notifications_page, load_public_page
+from listings import refresh_listing, remove_listing, refresh_owner_listings
+from uploads import receive_upload
+from storage import add_blob_reference, release_blob_reference
+from downloads import send_document
+from notifications import notify_users, unread_count, mark_notifications_read, publish_unread_count, user_channel
+from pubsub import pubsub
+import connection_pool
+import instrumentation
+import logs
+from replicas import use_replica
+from sharing import share_document, split_emails, read_share_csv
+from search import index_document, unindex_document, search_documents
+from extraction import queue_text_extraction, text_preview, delete_extracted_text
+from derivatives import queue_avatar_thumbnails
+
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
 def index():
     """Home page route."""
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
 
-@app.route('/role-selection', methods=['GET', 'POST'])
+@bp.route('/role-selection', methods=['GET', 'POST'])
 def role_selection():
     """Role selection page for registration."""
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = RoleSelectionForm()
     
     if form.validate_on_submit():
         role = request.form.get('role')
         if role in ['student', 'professor', 'company']:
-            return redirect(url_for('register', role=role))
+            return redirect(url_for('main.register', role=role))
         else:
             flash('Invalid role selected.', 'danger')
     
     return render_template('role_selection.html', form=form)
 
 
-@app.route('/register/<role>', methods=['GET', 'POST'])
+@bp.route('/register/<role>', methods=['GET', 'POST'])
 def register(role):
     """Registration page for specific roles."""
     if role not in ['student', 'professor', 'company']:
-        return redirect(url_for('role_selection'))
+        return redirect(url_for('main.role_selection'))
     
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = RegistrationForm()
     
@@ -84,16 +106,16 @@ def register(role):
         db.session.commit()
         
         flash(f'Your account has been created! You can now log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html', form=form, role=role)
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Login page."""
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = LoginForm()
     
@@ -103,44 +125,43 @@ def login():
         if user and user.check_password(form.password.data):
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
-            return redirect(next_page) if next_page else redirect(url_for('dashboard'))
+            return redirect(next_page) if next_page else redirect(url_for('main.dashboard'))
         else:
             flash('Login unsuccessful. Please check your email and password.', 'danger')
     
     return render_template('login.html', form=form)
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     """User logout."""
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
+@use_replica
 def dashboard():
     """User dashboard."""
-    user_documents = Document.query.filter_by(user_id=current_user.id).order_by(Document.uploaded_at.desc()).all()
-    
-    # Get documents shared with the user
-    collaborations = Collaboration.query.filter_by(user_id=current_user.id).all()
-    shared_documents = [collab.document for collab in collaborations]
-    
-    # Get recent notifications
-    notifications = Notification.query.filter_by(user_id=current_user.id, is_read=False).order_by(Notification.created_at.desc()).limit(5).all()
-    
+    # Owned documents, shared documents with their owners, recent
+    # notifications and card counts, without a query per shared document
+    dashboard_data = load_dashboard(current_user.id)
+
     return render_template(
-        'dashboard.html', 
-        user_documents=user_documents, 
-        shared_documents=shared_documents,
-        notifications=notifications,
-        Document=Document
+        'dashboard.html',
+        user_documents=dashboard_data['user_documents'],
+        shared_documents=dashboard_data['shared_documents'],
+        notifications=dashboard_data['notifications'],
+        document_count=dashboard_data['document_count'],
+        collaboration_count=dashboard_data['collaboration_count'],
+        unread_count=dashboard_data['unread_count']
     )
 
 
-@app.route('/profile', methods=['GET', 'POST'])
+@bp.route('/profile', methods=['GET', 'POST'])
 @login_required
+@use_replica
 def profile():
     """User profile page."""
     form = UpdateProfileForm(current_user.username, current_user.email)
@@ -169,16 +190,23 @@ def profile():
             current_user.company_name = form.company_name.data
         
         # Handle profile image upload
+        new_image = False
         if form.profile_image.data:
             try:
                 filename, file_path = save_file(form.profile_image.data, 'static/uploads')
                 current_user.profile_image = filename
+                current_user.avatar_hash = None  # show the original until its thumbnails are made
+                new_image = True
             except Exception as e:
                 flash(f'Error uploading profile image: {str(e)}', 'danger')
         
+        refresh_owner_listings(current_user)
         db.session.commit()
+        invalidate_user(current_user.id)
+        if new_image:
+            queue_avatar_thumbnails(current_user.id)
         flash('Your profile has been updated!', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     
     elif request.method == 'GET':
         form.username.data = current_user.username
@@ -196,10 +224,10 @@ def profile():
     # Get recent documents for the profile page
     documents = Document.query.filter_by(user_id=current_user.id).order_by(Document.uploaded_at.desc()).limit(5).all()
     
-    return render_template('profile.html', form=form, documents=documents, Document=Document)
+    return render_template('profile.html', form=form, documents=documents)
 
 
-@app.route('/upload-document', methods=['GET', 'POST'])
+@bp.route('/upload-document', methods=['GET', 'POST'])
 @login_required
 def upload_document():
     """Upload a new document."""
@@ -208,60 +236,176 @@ def upload_document():
     if form.validate_on_submit():
         if form.document.data and allowed_file(form.document.data.filename):
             try:
-                # Save the file
-                filename, file_path = save_file(form.document.data, 'static/uploads/documents')
+                # Receive the file, its size and hash come from the same pass
+                upload = receive_upload(form.document.data, current_app.config['DOCUMENT_FOLDER'])
+                file_type = get_file_type(form.document.data.filename)
+                
+                # Identical files are stored once and shared between documents
+                blob = add_blob_reference(upload, file_type)
                 
                 # Create document record
                 document = Document(
                     title=form.title.data,
                     description=form.description.data,
-                    file_path=filename,
-                    file_type=get_file_type(form.document.data.filename),
-                    file_size=get_file_size(file_path),
+                    file_path=blob.file_path,
+                    file_type=file_type,
+                    file_size=blob.file_size,
+                    content_hash=blob.content_hash,
                     is_public=form.is_public.data,
                     user_id=current_user.id
                 )
                 
                 db.session.add(document)
+                db.session.flush()
+                index_document(document)
+                refresh_listing(document)
                 db.session.commit()
                 
+                # Text is extracted and indexed in the background
+                queue_text_extraction(document.id)
+                
                 flash('Your document has been uploaded!', 'success')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             
             except Exception as e:
                 flash(f'Error uploading document: {str(e)}', 'danger')
         else:
             flash('Invalid file type. Please upload a valid document.', 'danger')
     
-    return render_template('upload_document.html', form=form, Document=Document)
+    return render_template('upload_document.html', form=form)
+
+@bp.route('/search')
+@login_required
+@use_replica
+def search():
+    """Search the documents the current user can view."""
+    query = request.args.get('q', '').strip()
+    documents = []
+    if query:
+        documents = search_documents(
+            current_user.id,
+            query,
+            limit=current_app.config['SEARCH_RESULTS_LIMIT'],
+            candidates=current_app.config['SEARCH_CANDIDATE_LIMIT']
+        )
+    
+    return render_template('search.html', query=query, documents=documents)
+
+
+@bp.route('/discover')
+@login_required
+@use_replica
+def discover():
+    """Browse public documents, optionally by the owner's role, college or field."""
+    filters = {name: request.args.get(name, '').strip() or None for name in ('role', 'college', 'field')}
+    try:
+        listings, next_cursor = load_public_page(
+            cursor=request.args.get('cursor'),
+            limit=current_app.config['DISCOVER_PER_PAGE'],
+            **filters
+        )
+    except ValueError:
+        abort(400)
+    
+    return render_template(
+        'discover.html',
+        listings=listings,
+        filters=filters,
+        next_url=url_for('main.discover', cursor=next_cursor, **filters) if next_cursor else None
+    )
+
+
+@bp.route('/discover/page')
+@login_required
+@use_replica
+def discover_page():
+    """One page of public documents as JSON."""
+    filters = {name: request.args.get(name, '').strip() or None for name in ('role', 'college', 'field')}
+    try:
+        listings, next_cursor = load_public_page(
+            cursor=request.args.get('cursor'),
+            limit=current_app.config['DISCOVER_PER_PAGE'],
+            **filters
+        )
+    except ValueError:
+        abort(400)
+    
+    return jsonify(
+        documents=[{
+            'id': listing.document_id,
+            'title': listing.title,
+            'summary': listing.summary,
+            'file_type': listing.file_type,
+            'file_size': listing.file_size,
+            'uploaded_at': listing.uploaded_at.isoformat(),
+            'owner': {
+                'username': listing.owner_username,
+                'role': listing.owner_role,
+                'college': listing.owner_college,
+                'field': listing.owner_field
+            },
+            'url': url_for('main.view_document', document_id=listing.document_id)
+        } for listing in listings],
+        next_url=url_for('main.discover_page', cursor=next_cursor, **filters) if next_cursor else None
+    )
+
 
-@app.route('/document/<int:document_id>')
+@bp.route('/document/<int:document_id>')
 @login_required
+@use_replica
 def view_document(document_id):
     """View a document."""
     document = Document.query.get_or_404(document_id)
     
     # Check if user has permission to view
-    if not document.is_public and document.user_id != current_user.id:
-        if not has_permission(current_user, document, 'view'):
-            abort(403)
+    if not has_document_permission(current_user, document, 'view'):
+        abort(403)
     
     # Get collaborators
     collaborators = User.query.join(Collaboration).filter(
         Collaboration.document_id == document.id
     ).all()
     
-    return render_template('document_view.html', document=document, collaborators=collaborators, Document=Document)
+    return render_template(
+        'document_view.html',
+        document=document,
+        collaborators=collaborators,
+        is_owner=document.user_id == current_user.id,
+        can_edit=has_document_permission(current_user, document, 'edit'),
+        extraction=document.text_extraction,
+        text_preview=text_preview(document.id)
+    )
+
+
+@bp.route('/document/<int:document_id>/extraction')
+@login_required
+def document_extraction(document_id):
+    """Text extraction progress for a document, as JSON."""
+    document = Document.query.get_or_404(document_id)
+    
+    if not has_document_permission(current_user, document, 'view'):
+        abort(403)
+    
+    extraction = document.text_extraction
+    if extraction is None:
+        return jsonify(status='pending', pages_done=0, pages_total=None)
+    
+    return jsonify(
+        status=extraction.status,
+        pages_done=extraction.pages_done,
+        pages_total=extraction.pages_total,
+        error=extraction.error
+    )
 
 
-@app.route('/document/<int:document_id>/edit', methods=['GET', 'POST'])
+@bp.route('/document/<int:document_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_document(document_id):
     """Edit a document."""
     document = Document.query.get_or_404(document_id)
     
     # Check if user has permission to edit
-    if document.user_id != current_user.id and not has_permission(current_user, document, 'edit'):
+    if not has_document_permission(current_user, document, 'edit'):
         abort(403)
     
     form = EditDocumentForm()
@@ -271,41 +415,37 @@ def edit_document(document_id):
         document.description = form.description.data
         document.is_public = form.is_public.data
         document.last_modified = datetime.utcnow()
+        index_document(document)
+        refresh_listing(document)
         
         db.session.commit()
         
         flash('Document has been updated!', 'success')
-        return redirect(url_for('view_document', document_id=document.id))
+        return redirect(url_for('main.view_document', document_id=document.id))
     
     elif request.method == 'GET':
         form.title.data = document.title
         form.description.data = document.description
         form.is_public.data = document.is_public
     
-    return render_template('edit_document.html', form=form, document=document, Document=Document)
+    return render_template('edit_document.html', form=form, document=document)
 
 
 
-@app.route('/document/<int:document_id>/download')
+@bp.route('/document/<int:document_id>/download')
 @login_required
 def download_document(document_id):
     """Download a document."""
     document = Document.query.get_or_404(document_id)
     
     # Check if user has permission to download
-    if not document.is_public and document.user_id != current_user.id:
-        if not has_permission(current_user, document, 'view'):
-            abort(403)
-    
-    return send_from_directory(
-        os.path.join(app.root_path, 'static/uploads/documents'),
-        document.file_path,
-        as_attachment=True,
-        download_name=f"{document.title}.{document.file_type}"
-    )
+    if not has_document_permission(current_user, document, 'view'):
+        abort(403)
+    
+    return send_document(document)
 
 
-@app.route('/document/<int:document_id>/delete', methods=['POST'])
+@bp.route('/document/<int:document_id>/delete', methods=['POST'])
 @login_required
 def delete_document(document_id):
     """Delete a document."""
@@ -316,24 +456,31 @@ def delete_document(document_id):
         abort(403)
     
     # Delete the file
-    try:
-        os.remove(os.path.join(app.root_path, 'static/uploads/documents', document.file_path))
-    except:
-        # If file doesn't exist, continue with deletion from DB
-        pass
-    
-    # Delete related collaborations
+    if document.content_hash:
+        # Blob files are only removed with their last document
+        release_blob_reference(document.content_hash)
+    else:
+        try:
+            os.remove(os.path.join(current_app.root_path, 'static/uploads/documents', document.file_path))
+        except:
+            # If file doesn't exist, continue with deletion from DB
+            pass
+    
+    # Delete related collaborations, search entries and extracted text
     Collaboration.query.filter_by(document_id=document.id).delete()
+    unindex_document(document.id)
+    delete_extracted_text(document.id)
+    remove_listing(document.id)
     
     # Delete the document record
     db.session.delete(document)
     db.session.commit()
     
     flash('Document has been deleted!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
 
-@app.route('/document/<int:document_id>/collaborate', methods=['GET', 'POST'])
+@bp.route('/document/<int:document_id>/collaborate', methods=['GET', 'POST'])
 @login_required
 def collaborate(document_id):
     """Add collaborators to a document."""
@@ -348,47 +495,125 @@ def collaborate(document_id):
     if form.validate_on_submit():
         collaborator = User.query.filter_by(email=form.collaborator_email.data).first()
         
-        # Check if user is already a collaborator
-        existing_collab = Collaboration.query.filter_by(
+        # Insert the collaboration, falling back to an update when the
+        # (document_id, user_id) unique constraint reports an existing share
+        collaboration = Collaboration(
             document_id=document.id,
-            user_id=collaborator.id
-        ).first()
+            user_id=collaborator.id,
+            permission=form.permission.data
+        )
         
-        if existing_collab:
-            existing_collab.permission = form.permission.data
-            db.session.commit()
-            flash(f'Collaboration with {collaborator.username} has been updated!', 'success')
-        else:
-            # Create new collaboration
-            collaboration = Collaboration(
+        try:
+            with db.session.begin_nested():
+                db.session.add(collaboration)
+            created = True
+        except IntegrityError:
+            Collaboration.query.filter_by(
                 document_id=document.id,
-                user_id=collaborator.id,
-                permission=form.permission.data
-            )
-            
-            db.session.add(collaboration)
-            db.session.commit()
-            
-            # Create notification for the collaborator
-            create_notification(
-                collaborator.id,
+                user_id=collaborator.id
+            ).update({Collaboration.permission: form.permission.data})
+            created = False
+        
+        db.session.commit()
+        invalidate_document_permission(collaborator.id, document.id)
+        
+        if created:
+            # Notify the collaborator
+            notify_users(
+                [collaborator.id],
                 f"{current_user.username} has shared a document '{document.title}' with you.",
                 related_document_id=document.id,
                 related_user_id=current_user.id
             )
             
             flash(f'Document has been shared with {collaborator.username}!', 'success')
+        else:
+            flash(f'Collaboration with {collaborator.username} has been updated!', 'success')
         
-        return redirect(url_for('view_document', document_id=document.id))
+        return redirect(url_for('main.view_document', document_id=document.id))
     
     # Get existing collaborators
     collaborations = Collaboration.query.filter_by(document_id=document.id).all()
     collaborators = [(collab, User.query.get(collab.user_id)) for collab in collaborations]
     
-    return render_template('collaborate.html', form=form, document=document, collaborators=collaborators, Document=Document)
+    return render_template(
+        'collaborate.html',
+        form=form,
+        bulk_form=BulkCollaborationForm(prefix='bulk'),
+        document=document,
+        collaborators=collaborators
+    )
+
+
+@bp.route('/document/<int:document_id>/collaborate/bulk', methods=['POST'])
+@login_required
+def bulk_collaborate(document_id):
+    """Share a document with many collaborators at once."""
+    document = Document.query.get_or_404(document_id)
+    
+    # Only the owner can add collaborators
+    if document.user_id != current_user.id:
+        abort(403)
+    
+    limit = current_app.config['BULK_SHARE_LIMIT']
+    
+    # JSON API: {"emails": [...], "permission": "view"} and/or
+    # {"collaborators": [{"email": ..., "permission": ...}]}
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            abort(400)
+        
+        permission = data.get('permission', 'view')
+        emails = data.get('emails') or []
+        collaborators = data.get('collaborators') or []
+        if not isinstance(permission, str):
+            return jsonify(error='permission must be a string.'), 400
+        if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+            return jsonify(error='emails must be a list of strings.'), 400
+        if not isinstance(collaborators, list) or not all(
+            isinstance(entry, dict)
+            and isinstance(entry.get('email'), str)
+            and isinstance(entry.get('permission', permission), str)
+            for entry in collaborators
+        ):
+            return jsonify(error='collaborators must be a list of objects with a string email and permission.'), 400
+        
+        entries = [(email, permission) for email in emails]
+        entries += [(entry['email'], entry.get('permission', permission)) for entry in collaborators]
+        if len(entries) > limit:
+            return jsonify(error=f'At most {limit} collaborators can be shared with at once.'), 400
+        
+        return jsonify(results=share_document(document, entries, current_user))
+    
+    form = BulkCollaborationForm(prefix='bulk')
+    
+    if form.validate_on_submit():
+        entries = [(email, form.permission.data) for email in split_emails(form.collaborator_emails.data or '')]
+        if form.csv_file.data:
+            entries += read_share_csv(form.csv_file.data, form.permission.data)
+        
+        if len(entries) > limit:
+            flash(f'At most {limit} collaborators can be shared with at once.', 'danger')
+        else:
+            results = share_document(document, entries, current_user)
+            
+            shared = sum(1 for result in results if result['status'] == 'shared')
+            updated = sum(1 for result in results if result['status'] == 'updated')
+            skipped = [result['email'] for result in results if result['status'] not in ('shared', 'updated')]
+            
+            flash(f'Document shared with {shared} new collaborators, {updated} updated.', 'success')
+            if skipped:
+                flash(f'Skipped {len(skipped)} entries: {", ".join(skipped[:10])}{"..." if len(skipped) > 10 else ""}', 'warning')
+    else:
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'danger')
+    
+    return redirect(url_for('main.collaborate', document_id=document.id))
 
 
-@app.route('/document/<int:document_id>/remove-collaborator/<int:user_id>', methods=['POST'])
+@bp.route('/document/<int:document_id>/remove-collaborator/<int:user_id>', methods=['POST'])
 @login_required
 def remove_collaborator(document_id, user_id):
     """Remove a collaborator from a document."""
@@ -407,41 +632,113 @@ def remove_collaborator(document_id, user_id):
     
     db.session.delete(collaboration)
     db.session.commit()
+    invalidate_document_permission(user_id, document.id)
     
-    # Create notification for the collaborator
-    create_notification(
-        collaborator.id,
+    # Notify the collaborator
+    notify_users(
+        [collaborator.id],
         f"{current_user.username} has removed you from the document '{document.title}'.",
         related_document_id=document.id,
         related_user_id=current_user.id
     )
     
     flash(f'Collaborator has been removed!', 'success')
-    return redirect(url_for('collaborate', document_id=document.id))
+    return redirect(url_for('main.collaborate', document_id=document.id))
 
 
-@app.route('/notifications')
+@bp.route('/notifications')
 @login_required
+@use_replica
 def notifications():
     """User notifications page."""
-    unread_notifications = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).order_by(Notification.created_at.desc()).all()
+    per_page = current_app.config['NOTIFICATIONS_PER_PAGE']
     
-    read_notifications = Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=True
-    ).order_by(Notification.created_at.desc()).all()
+    # Only the first page of each list is rendered, the rest is fetched
+    # from notifications_page() as the user scrolls
+    unread_notifications, unread_cursor = load_notifications_page(current_user.id, False, limit=per_page)
+    read_notifications, read_cursor = load_notifications_page(current_user.id, True, limit=per_page)
     
     return render_template(
         'notifications.html',
         unread_notifications=unread_notifications,
-        read_notifications=read_notifications
+        read_notifications=read_notifications,
+        unread_cursor=unread_cursor,
+        read_cursor=read_cursor,
+        unread_count=unread_count(current_user.id)
+    )
+
+
+@bp.route('/notifications/page')
+@login_required
+@use_replica
+def notifications_page():
+    """Next page of read or unread notifications as JSON."""
+    status = request.args.get('status', 'unread')
+    if status not in ['unread', 'read']:
+        abort(400)
+    
+    try:
+        notifications, next_cursor = load_notifications_page(
+            current_user.id,
+            status == 'read',
+            cursor=request.args.get('cursor'),
+            limit=current_app.config['NOTIFICATIONS_PER_PAGE']
+        )
+    except ValueError:
+        abort(400)
+    
+    return jsonify(
+        notifications=[{
+            'id': notification.id,
+            'content': notification.content,
+            'is_read': notification.is_read,
+            'created_at': notification.created_at.strftime('%B %d, %Y at %H:%M'),
+            'mark_read_url': url_for('main.mark_notification_read', notification_id=notification.id)
+        } for notification in notifications],
+        next_url=url_for('main.notifications_page', status=status, cursor=next_cursor) if next_cursor else None
     )
 
 
-@app.route('/notification/<int:notification_id>/mark-read', methods=['POST'])
+@bp.route('/notifications/stream')
+@login_required
+def notification_stream():
+    """Server-Sent Events stream of the current user's new notifications.
+
+    The stream holds no database connection while it waits, so under an
+    async worker (gunicorn -k gevent) an idle client costs a greenlet and
+    a socket. Comment lines are sent while idle to keep proxies from
+    closing the connection, and the stream ends after
+    NOTIFICATION_STREAM_TIMEOUT so the browser reconnects to a fresh worker.
+    """
+    subscription = pubsub.subscribe(user_channel(current_user.id))
+    urls = current_app.create_url_adapter(request)
+    heartbeat = current_app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    deadline = time.monotonic() + current_app.config['NOTIFICATION_STREAM_TIMEOUT']
+    
+    def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                # Messages are shared by every stream of the same user, so copy before adding to them
+                data = {key: value for key, value in message.items() if key != 'event'}
+                if 'id' in data:
+                    data['mark_read_url'] = urls.build('main.mark_notification_read', {'notification_id': data['id']})
+                yield f'event: {message["event"]}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            subscription.close()
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # stop nginx from buffering the stream
+    })
+
+
+@bp.route('/notification/<int:notification_id>/mark-read', methods=['POST'])
 @login_required
 def mark_notification_read(notification_id):
     """Mark a notification as read."""
@@ -451,40 +748,57 @@ def mark_notification_read(notification_id):
     if notification.user_id != current_user.id:
         abort(403)
     
-    notification.is_read = True
+    mark_notifications_read(current_user.id, [notification.id])
     db.session.commit()
+    publish_unread_count(current_user.id)
     
-    return redirect(url_for('notifications'))
+    return redirect(url_for('main.notifications'))
 
 
-@app.route('/notifications/mark-all-read', methods=['POST'])
+@bp.route('/notifications/mark-all-read', methods=['POST'])
 @login_required
 def mark_all_notifications_read():
     """Mark all notifications as read."""
-    Notification.query.filter_by(
-        user_id=current_user.id,
-        is_read=False
-    ).update({Notification.is_read: True})
-    
+    mark_notifications_read(current_user.id)
     db.session.commit()
+    publish_unread_count(current_user.id)
     
     flash('All notifications marked as read!', 'success')
-    return redirect(url_for('notifications'))
+    return redirect(url_for('main.notifications'))
+
+
+@bp.route('/internal/pool')
+@internal_only
+def pool_metrics():
+    """Database connection pool metrics for the worker serving the request."""
+    return jsonify(connection_pool.metrics.snapshot(db.engine.pool))
+
+
+@bp.route('/internal/metrics')
+@internal_only
+def prometheus_metrics():
+    """Request, connection pool and logging metrics for the worker serving the request, for Prometheus."""
+    return current_app.response_class(
+        instrumentation.metrics.render()
+        + instrumentation.render_pool_metrics(connection_pool.metrics.snapshot(db.engine.pool))
+        + instrumentation.render_log_metrics(logs.dropped_records()),
+        mimetype='text/plain; version=0.0.4'
+    )
 
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     """404 error handler."""
     return render_template('404.html'), 404
 
 
-@app.errorhandler(403)
+@bp.app_errorhandler(403)
 def forbidden(e):
     """403 error handler."""
     return render_template('403.html'), 403
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_server_error(e):
     """500 error handler."""
     return render_template('500.html'), 500
@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.orm import aliased, joinedload
+
+from app import db
+from models import Document, Collaboration, SearchTerm, TextChunk
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Title matches rank above description matches
+TITLE_WEIGHT = 3
+
+# Words too common to narrow a search; leaving them out keeps the largest
+# posting lists out of the index
+STOP_WORDS = frozenset('''
+    a an and are as at be by for from has in is it of on or that the this to was were with
+'''.split())
+
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(text):
+    """Split text into normalized search terms, in order, with repeats."""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return [
+        token[:64] for token in TOKEN_PATTERN.findall(text)
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def document_terms(document, texts=()):
+    """Weighted terms for a document's title, description and extracted text."""
+    weights = Counter(tokenize(document.description))
+    for text in texts:
+        weights.update(tokenize(text))
+    for term in tokenize(document.title):
+        weights[term] += TITLE_WEIGHT
+    return weights
+
+
+def index_document(document):
+    """Replace a document's entries in the search index.
+
+    Runs in the caller's transaction, so the index changes commit or roll
+    back together with the document. The document must have an ID.
+    """
+    unindex_document(document.id)
+    texts = [content for (content,) in db.session.query(TextChunk.content).filter_by(document_id=document.id)]
+    weights = document_terms(document, texts)
+    if weights:
+        db.session.execute(insert(SearchTerm), [
+            {'term': term, 'document_id': document.id, 'weight': weight}
+            for term, weight in weights.items()
+        ])
+
+
+def unindex_document(document_id):
+    """Remove a document from the search index."""
+    SearchTerm.query.filter_by(document_id=document_id).delete(synchronize_session=False)
+
+
+def term_frequency(term, cap=10000):
+    """Number of documents containing a term, counting no further than cap."""
+    postings = select(SearchTerm.document_id).where(SearchTerm.term == term).limit(cap).subquery()
+    return db.session.query(func.count()).select_from(postings).scalar()
+
+
+def search_documents(user_id, query, limit=50, candidates=200):
+    """Find documents a user may view that contain every term of a query.
+
+    The newest `candidates` visible matches are ranked by summed term
+    weight, so common terms cost a bounded walk down their posting list
+    rather than a sort of every match. Postings are joined rarest term
+    first, as found by a capped count per term. The permission check
+    (public, owned or shared with the user) is part of the same SELECT as
+    the match.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    if len(terms) > 1:
+        terms.sort(key=term_frequency)
+
+    postings = [aliased(SearchTerm) for _ in terms]
+    first = postings[0]
+    score = first.weight
+    matches = select(first.document_id.label('id'))
+    for posting, term in zip(postings[1:], terms[1:]):
+        matches = matches.join(posting, (posting.document_id == first.document_id) & (posting.term == term))
+        score = score + posting.weight
+
+    shared_ids = select(Collaboration.document_id).where(Collaboration.user_id == user_id)
+    matches = matches.add_columns(score.label('score')).join(
+        Document, Document.id == first.document_id
+    ).where(
+        first.term == terms[0],
+        or_(Document.is_public == True, Document.user_id == user_id, Document.id.in_(shared_ids))
+    ).order_by(first.document_id.desc()).limit(candidates).subquery()
+
+    return Document.query.join(
+        matches, matches.c.id == Document.id
+    ).options(
+        joinedload(Document.owner)
+    ).order_by(matches.c.score.desc(), Document.id.desc()).limit(limit).all()
+
+
+def reindex_documents(batch_size=1000):
+    """Rebuild the search index for every document, one batch per commit.
+
+    Returns the number of documents indexed.
+    """
+    indexed = 0
+    last_id = 0
+
+    while True:
+        documents = Document.query.filter(Document.id > last_id).order_by(Document.id).limit(batch_size).all()
+        if not documents:
+            break
+
+        document_ids = [document.id for document in documents]
+        texts = {}
+        for document_id, content in db.session.query(TextChunk.document_id, TextChunk.content).filter(
+            TextChunk.document_id.in_(document_ids)
+        ):
+            texts.setdefault(document_id, []).append(content)
+
+        SearchTerm.query.filter(SearchTerm.document_id.in_(document_ids)).delete(synchronize_session=False)
+        rows = [
+            {'term': term, 'document_id': document.id, 'weight': weight}
+            for document in documents
+            for term, weight in document_terms(document, texts.get(document.id, ())).items()
+        ]
+        if rows:
+            db.session.execute(insert(SearchTerm), rows)
+
+        last_id = documents[-1].id
+        indexed += len(documents)
+        db.session.commit()
+
+    return indexed
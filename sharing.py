@@ -0,0 +1,168 @@
+import csv
+import io
+import re
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import db
+from models import User, Collaboration
+from notifications import notify_users
+from permissions import PERMISSION_LEVELS, invalidate_document_permission
+
+EMAIL_SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def split_emails(text):
+    """Split a pasted list of emails on whitespace, commas and semicolons."""
+    return [email for email in EMAIL_SEPARATORS.split(text) if email]
+
+
+def read_share_csv(file, default_permission):
+    """Read (email, permission) pairs from an uploaded CSV file.
+
+    The file either has a header row with an 'email' column and an optional
+    'permission' column, or no header and the email in the first column.
+    """
+    rows = list(csv.reader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')))
+    if not rows:
+        return []
+
+    header = [column.strip().lower() for column in rows[0]]
+    if 'email' not in header:
+        return [(row[0].strip(), default_permission) for row in rows if row and row[0].strip()]
+
+    email_column = header.index('email')
+    permission_column = header.index('permission') if 'permission' in header else None
+    entries = []
+    for row in rows[1:]:
+        if len(row) <= email_column or not row[email_column].strip():
+            continue
+        permission = default_permission
+        if permission_column is not None and len(row) > permission_column and row[permission_column].strip():
+            permission = row[permission_column].strip().lower()
+        entries.append((row[email_column].strip(), permission))
+    return entries
+
+
+def upsert_collaborations(rows):
+    """Insert or update many collaborations, in one statement where the database has an upsert.
+
+    Relies on the (document_id, user_id) unique constraint: MySQL uses
+    ON DUPLICATE KEY UPDATE, SQLite and PostgreSQL use ON CONFLICT, and
+    any other database gets a bulk UPDATE plus a bulk INSERT.
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        stmt = mysql.insert(Collaboration).values(rows)
+        stmt = stmt.on_duplicate_key_update(permission=stmt.inserted.permission)
+    elif dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = dialect_insert(Collaboration).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['document_id', 'user_id'],
+            set_={'permission': stmt.excluded.permission}
+        )
+    else:
+        _update_then_insert_collaborations(rows)
+        return
+
+    db.session.execute(stmt)
+
+
+def _update_then_insert_collaborations(rows):
+    """Upsert for databases without an upsert statement, in the caller's transaction.
+
+    Existing (document_id, user_id) pairs are read first, then updated with
+    one executemany UPDATE and the rest added with one executemany INSERT.
+    A share created by a concurrent request in between still trips the
+    unique constraint, as it would for any insert.
+    """
+    existing = set(db.session.query(Collaboration.document_id, Collaboration.user_id).filter(
+        Collaboration.document_id.in_({row['document_id'] for row in rows}),
+        Collaboration.user_id.in_({row['user_id'] for row in rows})
+    ).all())
+    updates = [row for row in rows if (row['document_id'], row['user_id']) in existing]
+    inserts = [row for row in rows if (row['document_id'], row['user_id']) not in existing]
+
+    table = Collaboration.__table__
+    if updates:
+        db.session.execute(
+            update(table).where(
+                table.c.document_id == bindparam('match_document_id'),
+                table.c.user_id == bindparam('match_user_id')
+            ).values(permission=bindparam('new_permission')),
+            [{
+                'match_document_id': row['document_id'],
+                'match_user_id': row['user_id'],
+                'new_permission': row['permission']
+            } for row in updates]
+        )
+    if inserts:
+        db.session.execute(insert(table), inserts)
+
+
+def share_document(document, entries, sharer):
+    """Share a document with many users at once.
+
+    entries is a list of (email, permission) pairs; when an email appears
+    more than once its last permission wins. All users are resolved with one
+    IN query and all collaborations are written with one upsert, whatever
+    the number of entries. Returns one result per distinct email, in input
+    order, with a status of 'shared', 'updated', 'not_found', 'owner' or
+    'invalid'.
+    """
+    requested = {}
+    for email, permission in entries:
+        if isinstance(email, str) and email.strip():
+            requested[email.strip()] = permission
+
+    users = {}
+    if requested:
+        users = {user.email: user for user in User.query.filter(User.email.in_(list(requested))).all()}
+
+    existing = set()
+    user_ids = [user.id for user in users.values()]
+    if user_ids:
+        existing = {user_id for (user_id,) in db.session.query(Collaboration.user_id).filter(
+            Collaboration.document_id == document.id,
+            Collaboration.user_id.in_(user_ids)
+        )}
+
+    results = []
+    rows = []
+    for email, permission in requested.items():
+        user = users.get(email)
+        if not isinstance(permission, str) or permission not in PERMISSION_LEVELS:
+            status = 'invalid'
+        elif user is None:
+            status = 'not_found'
+        elif user.id == document.user_id:
+            status = 'owner'
+        else:
+            status = 'updated' if user.id in existing else 'shared'
+            rows.append({'document_id': document.id, 'user_id': user.id, 'permission': permission})
+        results.append({'email': email, 'permission': permission, 'status': status})
+
+    if rows:
+        # Read these before the commit expires them
+        document_id, message = document.id, f"{sharer.username} has shared a document '{document.title}' with you."
+        sharer_id = sharer.id
+
+        upsert_collaborations(rows)
+        db.session.commit()
+
+        for row in rows:
+            invalidate_document_permission(row['user_id'], document_id)
+
+        new_collaborators = [row['user_id'] for row in rows if row['user_id'] not in existing]
+        if new_collaborators:
+            notify_users(
+                new_collaborators,
+                message,
+                related_document_id=document_id,
+                related_user_id=sharer_id
+            )
+
+    return results
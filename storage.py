@@ -0,0 +1,181 @@
+import hashlib
+import os
+import secrets
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Document, DocumentBlob
+from replicas import RoutingSession
+
+
+def document_folder():
+    """Absolute path of the folder documents are stored in."""
+    return os.path.join(current_app.root_path, current_app.config['DOCUMENT_FOLDER'])
+
+
+def blob_file_path(content_hash, extension):
+    """Location of a blob relative to the document folder."""
+    return f"{content_hash[:2]}/{content_hash}.{extension}"
+
+
+def hash_file(path):
+    """SHA-256 and size of a file on disk, read in chunks."""
+    sha256 = hashlib.sha256()
+    size = 0
+    chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def add_blob_reference(upload, extension):
+    """Store a received upload by content hash and take a reference to it.
+
+    When an identical file is already stored the upload is discarded and
+    only the blob's reference count goes up. Returns the DocumentBlob; the
+    caller commits together with the Document that points at it.
+    """
+    content_hash = upload.sha256
+
+    # Atomic increment, which waits behind a concurrent release of the blob
+    updated = DocumentBlob.query.filter_by(content_hash=content_hash).update(
+        {DocumentBlob.ref_count: DocumentBlob.ref_count + 1}
+    )
+
+    if not updated:
+        blob = DocumentBlob(
+            content_hash=content_hash,
+            file_path=blob_file_path(content_hash, extension),
+            file_size=upload.size,
+            ref_count=1
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(blob)
+        except IntegrityError:
+            # Another request stored the same content first
+            DocumentBlob.query.filter_by(content_hash=content_hash).update(
+                {DocumentBlob.ref_count: DocumentBlob.ref_count + 1}
+            )
+
+    blob = db.session.get(DocumentBlob, content_hash)
+
+    # Only write the bytes when the blob file is not on disk yet
+    if os.path.exists(os.path.join(document_folder(), blob.file_path)):
+        upload.close()
+    else:
+        upload.save(blob.file_path)
+
+    return blob
+
+
+def release_blob_reference(content_hash):
+    """Drop a reference to a blob, deleting its file with the last one.
+
+    The file is moved aside while the blob row is locked, so a concurrent
+    upload of the same content waits for the release and then writes a
+    fresh copy. It is only deleted once the caller commits, and is put back
+    if the transaction ends without committing.
+    """
+    blob = DocumentBlob.query.filter_by(content_hash=content_hash).with_for_update().first()
+    if blob is None:
+        return
+
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        db.session.delete(blob)
+        db.session.flush()
+        path = os.path.join(document_folder(), blob.file_path)
+        released = f'{path}.{secrets.token_hex(8)}.released'
+        try:
+            os.replace(path, released)
+        except FileNotFoundError:
+            return
+        db.session.info.setdefault('released_files', []).append((released, path))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remove_released_files(db_session):
+    for released, path in db_session.info.pop('released_files', []):
+        try:
+            os.remove(released)
+        except FileNotFoundError:
+            pass
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _restore_released_files(db_session, transaction):
+    """Put back the files of blobs whose release was rolled back."""
+    if transaction.parent is None:
+        for released, path in db_session.info.pop('released_files', []):
+            os.replace(released, path)
+
+
+def dedupe_document_folder(batch_size=500):
+    """Move files uploaded before the blob store into it, merging duplicates.
+
+    Documents whose file is not a blob yet are hashed in batches of
+    batch_size. Each batch is committed before the original files are
+    removed, so an interrupted run never leaves a document without its file
+    and can simply be started again. Returns the number of documents moved,
+    the number of documents whose file is missing and the bytes freed.
+    """
+    folder = document_folder()
+    moved = missing = freed = 0
+    last_id = 0
+
+    while True:
+        documents = Document.query.outerjoin(
+            DocumentBlob, DocumentBlob.file_path == Document.file_path
+        ).filter(
+            DocumentBlob.content_hash.is_(None),
+            Document.id > last_id
+        ).order_by(Document.id).limit(batch_size).all()
+
+        if not documents:
+            break
+
+        originals = set()
+        for document in documents:
+            last_id = document.id
+            path = os.path.join(folder, document.file_path)
+            if not os.path.isfile(path):
+                missing += 1
+                continue
+
+            content_hash, size = hash_file(path)
+            blob = db.session.get(DocumentBlob, content_hash)
+            if blob is None:
+                blob = DocumentBlob(
+                    content_hash=content_hash,
+                    file_path=blob_file_path(content_hash, document.file_type),
+                    file_size=size,
+                    ref_count=0
+                )
+                db.session.add(blob)
+
+                # Link rather than move so the old path stays valid until commit
+                blob_path = os.path.join(folder, blob.file_path)
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.link(path, blob_path)
+            else:
+                freed += size
+
+            blob.ref_count += 1
+            document.file_path = blob.file_path
+            document.content_hash = content_hash
+            originals.add(path)
+            moved += 1
+
+        db.session.commit()
+
+        for path in originals:
+            os.remove(path)
+
+    return moved, missing, freed
@@ -0,0 +1,188 @@
+import os
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from app import db
+from models import User, Document, Collaboration, Notification
+
+ROLES = (('student', 0.7), ('professor', 0.2), ('company', 0.1))
+COLLEGES = ('MIT', 'Stanford', 'ETH Zurich', 'IIT Bombay', 'University of Toronto', 'TU Delft', 'Tsinghua', 'EPFL')
+FIELDS = ('Computer Science', 'Biology', 'Physics', 'Economics', 'Mechanical Engineering', 'Chemistry')
+WORDS = (
+    'analysis', 'protein', 'network', 'quantum', 'market', 'survey', 'thermal', 'neural',
+    'climate', 'robotics', 'genome', 'policy', 'materials', 'optimization', 'report', 'thesis',
+    'dataset', 'catalyst', 'turbine', 'lattice', 'inference', 'ecology', 'supply', 'imaging'
+)
+FILE_TYPES = ('pdf', 'pdf', 'pdf', 'docx', 'docx', 'pptx', 'xlsx', 'txt')
+
+
+def username(user_id):
+    """The username of a generated user."""
+    return f'user{user_id}'
+
+
+def email(user_id):
+    """The email, and so the login, of a generated user."""
+    return f'user{user_id}@example.com'
+
+
+class Generator:
+    """Random rows with production-like skew, drawn from one seeded RNG.
+
+    A user's activity falls off as 1 / rank ** skew, so the first few
+    generated users own and receive a large share of the documents and
+    shares while most of the long tail barely appears.
+    """
+
+    def __init__(self, first_user_id, users, skew, days, seed=None):
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow()
+        self.span = days * 24 * 3600
+        self.user_ids = range(first_user_id, first_user_id + users)
+        self.cum_weights = list(accumulate(1 / rank ** skew for rank in range(1, users + 1)))
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.span)
+
+    def active_users(self, k):
+        """k user IDs, drawn by activity."""
+        return self.rng.choices(self.user_ids, cum_weights=self.cum_weights, k=k)
+
+    def words(self, k):
+        return ' '.join(self.rng.choices(WORDS, k=k))
+
+    def user(self, user_id, password_hash):
+        role = self.rng.choices([role for role, _ in ROLES], [share for _, share in ROLES])[0]
+        return {
+            'id': user_id,
+            'username': username(user_id),
+            'email': email(user_id),
+            'password_hash': password_hash,
+            'role': role,
+            'profile_image': 'default.jpg',
+            'unread_notifications': 0,
+            'created_at': self.moment(),
+            'college': self.rng.choice(COLLEGES) if role != 'company' else None,
+            'field': self.rng.choice(FIELDS) if role == 'professor' else None,
+            'company_name': f'{self.rng.choice(WORDS).capitalize()} Labs' if role == 'company' else None
+        }
+
+    def document(self, document_id, owner_id):
+        file_type = self.rng.choice(FILE_TYPES)
+        uploaded_at = self.moment()
+        return {
+            'id': document_id,
+            'title': self.words(3).capitalize(),
+            'description': self.words(self.rng.randrange(0, 40)) or None,
+            'file_path': f'synthetic-{document_id}.{file_type}',
+            'file_type': file_type,
+            'file_size': int(self.rng.lognormvariate(12.5, 1.2)),  # a few hundred KB, with a long tail of large files
+            'is_public': self.rng.random() < 0.3,
+            'uploaded_at': uploaded_at,
+            'last_modified': uploaded_at,
+            'user_id': owner_id
+        }
+
+    def recipients(self, owner_id, mean):
+        """Distinct users a document is shared with, never its owner."""
+        k = min(int(self.rng.expovariate(1 / mean) + 0.5), len(self.user_ids) - 1) if mean else 0
+        return set(self.active_users(k)) - {owner_id} if k else set()
+
+    def notification(self, document_ids):
+        # Drawn again until the sender is someone else; generate_data
+        # makes sure there are at least two users
+        user_id, sender_id = self.active_users(2)
+        while sender_id == user_id:
+            sender_id = self.active_users(1)[0]
+        return {
+            'user_id': user_id,
+            'content': f'{username(sender_id)} has shared a document with you.',
+            'is_read': self.rng.random() < 0.7,
+            'created_at': self.moment(),
+            'related_document_id': self.rng.choice(document_ids),
+            'related_user_id': sender_id
+        }
+
+
+def _insert(model, rows):
+    """One executemany INSERT through Core, skipping the ORM unit of work."""
+    if rows:
+        db.session.connection().execute(model.__table__.insert(), rows)
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def generate_data(users, documents, collaborations, notifications, skew=0.8, days=365,
+                  batch_size=10000, files_folder=None, password='password', seed=None, progress=None):
+    """Append synthetic users, documents, collaborations and notifications.
+
+    Rows are built a batch at a time and written with executemany INSERTs,
+    one commit per batch, so memory stays flat however many are asked for.
+    IDs continue from the highest existing ones. With files_folder, every
+    document gets a sparse file of its recorded size there. The derived
+    tables (search index, public listing, unread counters) are not touched;
+    rebuild them afterwards. Returns the number of rows written per model.
+    """
+    if (documents or notifications) and not users:
+        raise ValueError('documents and notifications need users to belong to')
+    if notifications and users < 2:
+        raise ValueError('notifications need at least two users, a recipient and a sender')
+    if notifications and not documents:
+        raise ValueError('notifications need documents to refer to')
+
+    report = progress or (lambda message: None)
+    first_user_id = _next_id(User)
+    first_document_id = _next_id(Document)
+    generator = Generator(first_user_id, users, skew, days, seed)
+    password_hash = generate_password_hash(password)
+    written = {'users': 0, 'documents': 0, 'collaborations': 0, 'notifications': 0}
+
+    for start in range(0, users, batch_size):
+        _insert(User, [
+            generator.user(user_id, password_hash)
+            for user_id in generator.user_ids[start:start + batch_size]
+        ])
+        db.session.commit()
+        written['users'] += min(batch_size, users - start)
+        report(f'{written["users"]} users')
+
+    # Shares are drawn per document, in the same pass, so the owner can
+    # be left out without keeping every document in memory
+    mean_shares = collaborations / documents if documents else 0
+    document_ids = range(first_document_id, first_document_id + documents)
+    for start in range(0, documents, batch_size):
+        batch = document_ids[start:start + batch_size]
+        owners = generator.active_users(len(batch))
+        rows = [generator.document(document_id, owner_id) for document_id, owner_id in zip(batch, owners)]
+        shares = [
+            {'document_id': document_id, 'user_id': user_id, 'permission': generator.rng.choice(('view', 'view', 'comment', 'edit'))}
+            for document_id, owner_id in zip(batch, owners)
+            for user_id in generator.recipients(owner_id, mean_shares)
+        ]
+
+        if files_folder:
+            for row in rows:
+                with open(os.path.join(files_folder, row['file_path']), 'wb') as f:
+                    f.truncate(row['file_size'])
+
+        _insert(Document, rows)
+        _insert(Collaboration, shares)
+        db.session.commit()
+        written['documents'] += len(rows)
+        written['collaborations'] += len(shares)
+        report(f'{written["documents"]} documents, {written["collaborations"]} collaborations')
+
+    for start in range(0, notifications, batch_size):
+        rows = [generator.notification(document_ids) for _ in range(min(batch_size, notifications - start))]
+        _insert(Notification, rows)
+        db.session.commit()
+        written['notifications'] += len(rows)
+        report(f'{written["notifications"]} notifications')
+
+    return written
@@ -0,0 +1,44 @@
+import pytest
+
+from app import db
+from models import User, Document, Collaboration
+
+
+@pytest.fixture
+def document(app, client):
+    owner = User(username='owner', email='owner@example.com', role='professor')
+    owner.set_password('password')
+    collaborator = User(username='collaborator', email='collaborator@example.com', password_hash='x', role='student')
+    db.session.add_all([owner, collaborator])
+    db.session.flush()
+    document = Document(title='Syllabus', file_path='syllabus.pdf', file_type='pdf', file_size=1024, user_id=owner.id)
+    db.session.add(document)
+    db.session.commit()
+    client.post('/login', data={'email': 'owner@example.com', 'password': 'password'})
+    return document
+
+
+def test_bulk_collaborate_shares_by_email(client, document):
+    response = client.post(f'/document/{document.id}/collaborate/bulk', json={
+        'emails': ['collaborator@example.com', 'nobody@example.com'],
+        'permission': 'edit'
+    })
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.get_json()['results']] == ['shared', 'not_found']
+    assert Collaboration.query.filter_by(document_id=document.id).one().permission == 'edit'
+
+
+@pytest.mark.parametrize('body', [
+    {'emails': 'collaborator@example.com'},
+    {'emails': [['collaborator@example.com']]},
+    {'emails': ['collaborator@example.com'], 'permission': ['edit']},
+    {'collaborators': 'collaborator@example.com'},
+    {'collaborators': [{'email': 'collaborator@example.com', 'permission': 2}]},
+    {'collaborators': [{'email': None}]},
+])
+def test_bulk_collaborate_rejects_malformed_json(client, document, body):
+    response = client.post(f'/document/{document.id}/collaborate/bulk', json=body)
+
+    assert response.status_code == 400
+    assert Collaboration.query.count() == 0
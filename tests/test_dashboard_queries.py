@@ -0,0 +1,63 @@
+from sqlalchemy import event
+
+from app import db
+from models import User, Document, Collaboration
+
+
+def _create_user(username, email, role='student'):
+    user = User(username=username, email=email, role=role)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _share_documents(owner, collaborator, count):
+    """Create documents owned by owner and shared with collaborator."""
+    for i in range(count):
+        document = Document(
+            title=f'Shared {i}',
+            file_path=f'shared-{i}.pdf',
+            file_type='pdf',
+            file_size=1024,
+            user_id=owner.id
+        )
+        db.session.add(document)
+        db.session.flush()
+        db.session.add(Collaboration(user_id=collaborator.id, document_id=document.id, permission='view'))
+    db.session.commit()
+
+
+def _count_dashboard_queries(client):
+    """SQL statements executed while serving one dashboard request."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', record)
+    try:
+        response = client.get('/dashboard')
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', record)
+
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_dashboard_query_count_does_not_grow_with_shared_documents(app, client):
+    viewer = _create_user('viewer', 'viewer@example.com')
+    owner = _create_user('owner', 'owner@example.com', role='professor')
+    client.post('/login', data={'email': 'viewer@example.com', 'password': 'password'})
+
+    _share_documents(owner, viewer, 1)
+    # Warm per-process caches so both measurements see the same state
+    client.get('/dashboard')
+    few = _count_dashboard_queries(client)
+
+    _share_documents(owner, viewer, 25)
+    client.get('/dashboard')
+    many = _count_dashboard_queries(client)
+
+    assert many == few
+    assert many <= 5
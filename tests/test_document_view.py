@@ -0,0 +1,30 @@
+import fragments
+from app import db
+from models import User, Document, Collaboration
+
+
+def test_document_view_renders_and_caches_cards(app, client):
+    owner = User(username='owner', email='owner@example.com', role='professor')
+    owner.set_password('password')
+    viewer = User(username='viewer', email='viewer@example.com', role='student')
+    viewer.set_password('password')
+    db.session.add_all([owner, viewer])
+    db.session.flush()
+    document = Document(title='Field notes', description='Notes from the field', file_path='notes.pdf',
+                        file_type='pdf', file_size=1024, user_id=owner.id)
+    db.session.add(document)
+    db.session.flush()
+    db.session.add(Collaboration(user_id=viewer.id, document_id=document.id, permission='view'))
+    db.session.commit()
+    client.post('/login', data={'email': 'viewer@example.com', 'password': 'password'})
+
+    fragments._fragment_cache.clear()
+    response = client.get(f'/document/{document.id}')
+    assert response.status_code == 200
+    assert b'Field notes' in response.data
+    cached = len(fragments._fragment_cache)
+    assert cached > 0
+
+    # A second view reuses the cached cards instead of adding new ones
+    assert client.get(f'/document/{document.id}').data == response.data
+    assert len(fragments._fragment_cache) == cached
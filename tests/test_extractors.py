@@ -0,0 +1,35 @@
+import queue
+
+import extractors
+
+
+def _read_batches(path, file_type, batch_size, max_pages):
+    batches = queue.Queue()
+    extractors.extract_batches(path, file_type, batch_size, max_pages, batches, timeout=1)
+    return list(iter(batches.get_nowait, None))
+
+
+def test_extract_batches_reads_the_file_once(tmp_path, monkeypatch):
+    path = tmp_path / 'notes.txt'
+    path.write_text(''.join(f'{block:04d}' * 4 for block in range(10)), encoding='utf-8')
+    monkeypatch.setattr(extractors, 'TEXT_PAGE_SIZE', 16)
+
+    opened = []
+    read_text_blocks = extractors._iter_text_blocks
+    monkeypatch.setattr(extractors, '_iter_text_blocks', lambda path: opened.append(path) or read_text_blocks(path))
+
+    batches = _read_batches(str(path), 'txt', batch_size=3, max_pages=100)
+
+    assert len(opened) == 1
+    assert [len(texts) for texts, total in batches] == [3, 3, 3, 1]
+    assert ''.join(text for texts, total in batches for text in texts) == path.read_text(encoding='utf-8')
+
+
+def test_extract_batches_stops_at_max_pages(tmp_path, monkeypatch):
+    path = tmp_path / 'notes.txt'
+    path.write_text('x' * 160, encoding='utf-8')
+    monkeypatch.setattr(extractors, 'TEXT_PAGE_SIZE', 16)
+
+    batches = _read_batches(str(path), 'txt', batch_size=3, max_pages=4)
+
+    assert [len(texts) for texts, total in batches] == [3, 1]
@@ -0,0 +1,25 @@
+import time
+
+from flask import Response
+
+from instrumentation import metrics
+
+
+def test_streamed_responses_are_recorded_once_closed(app, client):
+    def slow_stream():
+        def chunks():
+            yield 'first\n'
+            time.sleep(0.2)
+            yield 'last\n'
+        return Response(chunks(), mimetype='text/plain')
+
+    app.add_url_rule('/slow-stream', 'slow_stream', slow_stream)
+    metrics.reset()
+
+    response = client.get('/slow-stream', buffered=False)
+    assert ('slow_stream', 200) not in metrics.requests
+
+    assert b''.join(response.response) == b'first\nlast\n'
+    response.close()
+    assert metrics.requests[('slow_stream', 200)] == 1
+    assert metrics.histograms['slow_stream']['http_request_duration_seconds'].sum >= 0.2
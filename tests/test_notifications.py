@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from models import User, Notification
+from notifications import fan_out_notifications, user_channel
+from pubsub import pubsub
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_fan_out_inserts_each_batch_in_one_statement(app, monkeypatch, returning):
+    users = [User(username=f'user{n}', email=f'user{n}@example.com', password_hash='x', role='student') for n in range(5)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+    subscriptions = {user_id: pubsub.subscribe(user_channel(user_id)) for user_id in user_ids}
+
+    app.config['NOTIFICATION_BATCH_SIZE'] = 2
+    # Without RETURNING, as on MySQL, the IDs are read back by query
+    monkeypatch.setattr(db.engine.dialect, 'insert_executemany_returning', returning)
+    inserts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO notification'):
+            inserts.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', record)
+    try:
+        notification_ids = fan_out_notifications(user_ids, 'Hello', related_user_id=user_ids[0])
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', record)
+
+    assert len(inserts) == 3
+    assert notification_ids == [notification.id for notification in Notification.query.order_by(Notification.id)]
+    for user_id, subscription in subscriptions.items():
+        message = subscription.get(timeout=1)
+        assert message['id'] == Notification.query.filter_by(user_id=user_id).one().id
+        assert message['unread_count'] == 1
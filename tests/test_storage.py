@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from app import db
+from models import DocumentBlob
+from storage import document_folder, release_blob_reference
+
+
+@pytest.fixture
+def blob(app, tmp_path):
+    app.config['DOCUMENT_FOLDER'] = str(tmp_path)
+    blob = DocumentBlob(content_hash='ab' * 32, file_path='ab/stored.pdf', file_size=5, ref_count=1)
+    db.session.add(blob)
+    db.session.commit()
+    path = os.path.join(document_folder(), blob.file_path)
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        f.write(b'bytes')
+    return path
+
+
+def test_released_blob_file_is_removed_on_commit(blob):
+    release_blob_reference('ab' * 32)
+    assert not os.path.exists(blob)
+
+    db.session.commit()
+    assert os.listdir(os.path.dirname(blob)) == []
+    assert db.session.get(DocumentBlob, 'ab' * 32) is None
+
+
+def test_released_blob_file_is_kept_on_rollback(blob):
+    release_blob_reference('ab' * 32)
+    db.session.rollback()
+
+    assert os.listdir(os.path.dirname(blob)) == ['stored.pdf']
+    assert db.session.get(DocumentBlob, 'ab' * 32).ref_count == 1
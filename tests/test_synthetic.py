@@ -0,0 +1,18 @@
+import pytest
+
+from models import Notification
+from synthetic import generate_data
+
+
+def test_notifications_are_never_sent_by_their_recipient(app):
+    generate_data(users=2, documents=5, collaborations=5, notifications=200, seed=1)
+
+    notifications = Notification.query.all()
+    assert len(notifications) == 200
+    assert all(notification.related_user_id != notification.user_id for notification in notifications)
+
+
+@pytest.mark.parametrize('users, documents, notifications', [(0, 5, 0), (0, 0, 5), (1, 5, 5), (2, 0, 5)])
+def test_generate_data_rejects_rows_it_cannot_generate(app, users, documents, notifications):
+    with pytest.raises(ValueError):
+        generate_data(users=users, documents=documents, collaborations=0, notifications=notifications)
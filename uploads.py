@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Endpoints whose file parts are streamed straight into the document folder
+STREAMING_ENDPOINTS = {'main.upload_document'}
+
+
+def is_allowed_extension(filename):
+    """Check a filename against the configured document extensions."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+class UploadStream:
+    """Writable temporary file that counts and hashes bytes as they arrive.
+
+    The multipart parser writes each chunk of the file part into this stream
+    as it reads it from the socket, so the size limit is enforced while the
+    body is still arriving and the SHA-256 is ready as soon as parsing ends.
+    The temporary file lives in the destination folder so that saving it is
+    a rename rather than a copy.
+    """
+
+    def __init__(self, folder, max_size=None):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.folder = folder
+        self.max_size = max_size
+        self.size = 0
+        self.saved = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def save(self, filename):
+        """Move the received file to its final name in the upload folder."""
+        self._file.close()
+        file_path = os.path.join(self.folder, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(self.temp_path, file_path)
+        self.saved = True
+        return file_path
+
+    def close(self):
+        self._file.close()
+        # Anything not saved by the view is a leftover from a failed upload
+        if not self.saved and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __getattr__(self, name):
+        # read(), seek(), tell() and friends for FileStorage
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request that streams document uploads to disk chunk by chunk."""
+
+    @property
+    def max_content_length(self):
+        if current_app and self.endpoint in STREAMING_ENDPOINTS:
+            # Room for the file plus the other form fields
+            return current_app.config['MAX_DOCUMENT_SIZE'] + current_app.config['MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in STREAMING_ENDPOINTS:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        # Reject before a single byte of the file is written
+        if filename and not is_allowed_extension(filename):
+            raise UnsupportedMediaType()
+        if content_length and content_length > current_app.config['MAX_DOCUMENT_SIZE']:
+            raise RequestEntityTooLarge()
+
+        return UploadStream(
+            os.path.join(current_app.root_path, current_app.config['DOCUMENT_FOLDER']),
+            max_size=current_app.config['MAX_DOCUMENT_SIZE']
+        )
+
+
+def receive_upload(file, folder):
+    """Make sure an uploaded file is on disk with its size and SHA-256.
+
+    Files that were streamed by UploadRequest are returned as they are.
+    Anything else is copied into an UploadStream in UPLOAD_CHUNK_SIZE chunks,
+    so the size and hash are computed in the same pass.
+    """
+    if isinstance(file.stream, UploadStream):
+        return file.stream
+
+    stream = UploadStream(os.path.join(current_app.root_path, folder))
+    chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+    try:
+        for chunk in iter(lambda: file.stream.read(chunk_size), b''):
+            stream.write(chunk)
+    except Exception:
+        stream.close()
+        raise
+    return stream
@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+from app import db, login_manager
+from models import User
+
+# Columns kept for the logged-in user: what the layout, sidebar and
+# profile card read on every page
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'role', 'profile_image', 'avatar_hash', 'college', 'field', 'company_name')
+
+# Process-wide LRU of user_id -> (snapshot fields, expires_at). Invalidation
+# only reaches the current process (and the shared cache, when configured),
+# so USER_CACHE_TTL bounds how long another worker can show stale details.
+_user_cache = OrderedDict()
+_user_cache_lock = Lock()
+_shared_caches = {}
+
+
+class UserSnapshot:
+    """A lightweight stand-in for the logged-in User.
+
+    Holds only SNAPSHOT_FIELDS. Reading any other attribute, or writing any
+    attribute, loads the full User row once and works on that, so routes can
+    keep treating current_user as the model.
+    """
+
+    __slots__ = SNAPSHOT_FIELDS + ('_user',)
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, fields):
+        for name, value in zip(SNAPSHOT_FIELDS, fields):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_user', None)
+
+    def get_id(self):
+        return str(self.id)
+
+    def load(self):
+        """The full User model for this snapshot."""
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        # Keep protocol probes such as Jinja's __html__ check off the database
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+        if name in SNAPSHOT_FIELDS:
+            object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (UserSnapshot, User)):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<User {self.username}>'
+
+
+def _shared_cache():
+    """The cross-process cache named by USER_CACHE_BACKEND, if any.
+
+    The backend is the import path of a class taking the app and providing
+    get(key), set(key, value, timeout) and delete(key), as cachelib caches do.
+    """
+    backend = current_app.config['USER_CACHE_BACKEND']
+    if not backend:
+        return None
+    app = current_app._get_current_object()
+    if app not in _shared_caches:
+        _shared_caches[app] = import_string(backend)(app)
+    return _shared_caches[app]
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Load the logged-in user as a snapshot, without a query when cached."""
+    user_id = int(user_id)
+    ttl = current_app.config['USER_CACHE_TTL']
+    now = time.monotonic()
+
+    if ttl:
+        with _user_cache_lock:
+            cached = _user_cache.get(user_id)
+            if cached and cached[1] > now:
+                _user_cache.move_to_end(user_id)
+                return UserSnapshot(cached[0])
+
+    shared = _shared_cache() if ttl else None
+    fields = shared.get(f'user:{user_id}') if shared else None
+
+    if fields is None:
+        row = db.session.query(*(getattr(User, name) for name in SNAPSHOT_FIELDS)).filter(
+            User.id == user_id
+        ).first()
+        if row is None:
+            return None
+        fields = tuple(row)
+        if shared:
+            shared.set(f'user:{user_id}', fields, ttl)
+
+    if ttl:
+        with _user_cache_lock:
+            _user_cache[user_id] = (fields, now + ttl)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > current_app.config['USER_CACHE_SIZE']:
+                _user_cache.popitem(last=False)
+
+    return UserSnapshot(fields)
+
+
+def invalidate_user(user_id):
+    """Forget a cached user after their profile changes."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    shared = _shared_cache()
+    if shared:
+        shared.delete(f'user:{user_id}')